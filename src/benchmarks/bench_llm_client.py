@@ -0,0 +1,90 @@
+"""
+Per-call overhead of a fresh ChatOpenAI (with its own httpx client) per invoke_llm call vs. the cached, keep-alive
+client from get_chat_model. A bare ChatOpenAI() is not the baseline: langchain_openai already shares a default
+httpx client between instances.
+
+Starts a local OpenAI-compatible stub server that answers every chat completion instantly, so the measured time
+is client construction plus connection setup plus request handling, not model latency.
+
+    python src/benchmarks/bench_llm_client.py [calls]
+"""
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+from langchain_openai import ChatOpenAI
+
+from revolve.llm import get_chat_model
+
+COMPLETION = json.dumps({
+    "id": "chatcmpl-bench",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "bench-model",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 5, "completion_tokens": 1, "total_tokens": 6},
+}).encode("utf-8")
+
+
+class StubOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True  # TCP_NODELAY, so small responses are not held back by delayed ACKs
+    connections = set()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        StubOpenAIHandler.connections.add(self.client_address)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(COMPLETION)))
+        self.end_headers()
+        self.wfile.write(COMPLETION)
+
+    def log_message(self, *args):
+        pass
+
+
+def run(label, invoke, calls):
+    StubOpenAIHandler.connections.clear()
+    messages = [{"role": "user", "content": "ping"}]
+    invoke(messages)  # warm up imports and the first connection
+    StubOpenAIHandler.connections.clear()
+
+    started = time.perf_counter()
+    for _ in range(calls):
+        invoke(messages)
+    elapsed = time.perf_counter() - started
+    print(
+        f"{label:<22} {elapsed / calls * 1000:8.2f} ms/call  "
+        f"{len(StubOpenAIHandler.connections):4d} TCP connections for {calls} calls"
+    )
+    return elapsed / calls
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOpenAIHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    settings = dict(model="bench-model", temperature=0.2, max_tokens=16000, base_url=base_url, api_key="bench")
+
+    def fresh_client(messages):
+        with httpx.Client() as http_client:
+            ChatOpenAI(**settings, http_client=http_client).invoke(messages)
+
+    def cached_client(messages):
+        get_chat_model(**settings).invoke(messages)
+
+    try:
+        fresh = run("fresh client per call", fresh_client, calls)
+        cached = run("cached client", cached_client, calls)
+        print(f"{'overhead saved':<22} {(fresh - cached) * 1000:8.2f} ms/call ({fresh / cached:.1f}x)")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
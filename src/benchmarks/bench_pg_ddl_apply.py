@@ -0,0 +1,60 @@
+"""
+Timing comparison for apply_create_table_ddls: the serial path (DDL_APPLY_WORKERS=1) vs. level-parallel creation.
+
+Builds a synthetic schema (a tree of FK references, `fanout` children per table) in a scratch database next to
+the one configured through the DB_* environment variables, introspects it, and recreates it into a second
+scratch database with each strategy.
+
+    python src/benchmarks/bench_pg_ddl_apply.py [tables] [fanout] [workers]
+"""
+import os
+import sys
+import time
+
+from bench_pg_introspection import build_schema
+from revolve.db.postgres_adapter import PostgresAdapter
+
+
+def main():
+    table_count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    fanout = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    workers = sys.argv[3] if len(sys.argv) > 3 else "4"
+
+    user, password = os.getenv("DB_USER"), os.getenv("DB_PASSWORD")
+    host, port = os.getenv("DB_HOST"), os.getenv("DB_PORT")
+    base_dbname = os.getenv("DB_NAME")
+    source_dbname = f"{base_dbname}_ddl_bench"
+    target_dbname = f"{base_dbname}_ddl_bench_target"
+
+    adapter = PostgresAdapter()
+    adapter.recreate_database_psycopg2(source_dbname, user, password, host, port)
+    os.environ["DB_NAME"] = source_dbname
+    try:
+        build_schema(adapter, table_count, fanout=fanout)
+        schemas = adapter.get_catalog_schemas()
+        ddls = adapter.gen_table_map(schemas)
+        dependencies = adapter.schema_dependencies(schemas)
+        depth = len(adapter.dependency_levels(dependencies))
+
+        results = {}
+        for label, worker_setting in (("serial", "1"), (f"parallel x{workers}", workers)):
+            adapter.recreate_database_psycopg2(target_dbname, user, password, host, port)
+            os.environ["DDL_APPLY_WORKERS"] = worker_setting
+            started = time.perf_counter()
+            adapter.apply_create_table_ddls(
+                ddls, source_dbname, target_dbname, user, password, host, port, dependencies=dependencies
+            )
+            results[label] = time.perf_counter() - started
+    finally:
+        os.environ["DB_NAME"] = base_dbname
+        os.environ.pop("DDL_APPLY_WORKERS", None)
+
+    print(f"{table_count} tables, dependency depth {depth}")
+    for label, seconds in results.items():
+        print(f"{label:>14}: {seconds * 1000:10.1f} ms")
+    serial, parallel = results.values()
+    print(f"{'speedup':>14}: {serial / parallel:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
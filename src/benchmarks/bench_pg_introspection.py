@@ -0,0 +1,85 @@
+"""
+Scaling benchmark for schema introspection: information_schema (two queries + merge) vs. the single pg_catalog query.
+
+Builds synthetic schemas of 10, 1,000 and 10,000 tables (each with a serial PK, a varchar, a numeric, an enum
+column with a default and an FK to the previous table) in a scratch database next to the one configured through
+the DB_* environment variables, then times both introspection paths on each.
+
+    python src/benchmarks/bench_pg_introspection.py [sizes...]
+"""
+import os
+import sys
+import time
+
+from revolve.db.postgres_adapter import PostgresAdapter
+
+BATCH_SIZE = 500
+
+
+def build_schema(adapter, table_count, fanout=1):
+    """Create `table_count` tables; table i references table (i - 1) // fanout, so fanout=1 builds one long chain."""
+    with adapter._connection() as conn, conn.cursor() as cur:
+        cur.execute("DROP SCHEMA public CASCADE; CREATE SCHEMA public;")
+        cur.execute("CREATE TYPE bench_status AS ENUM ('active', 'inactive', 'archived');")
+        conn.commit()
+        for start in range(0, table_count, BATCH_SIZE):
+            stop = min(start + BATCH_SIZE, table_count)
+            cur.execute(f"""
+            DO $$
+            BEGIN
+                FOR i IN {start}..{stop - 1} LOOP
+                    EXECUTE format(
+                        'CREATE TABLE bench_%s (
+                            id serial PRIMARY KEY,
+                            name varchar(120) NOT NULL,
+                            amount numeric(12, 2),
+                            status bench_status DEFAULT ''active'',
+                            parent_id integer %s
+                        )',
+                        i,
+                        CASE WHEN i = 0 THEN '' ELSE format('REFERENCES bench_%s (id)', (i - 1) / {fanout}) END
+                    );
+                END LOOP;
+            END $$;
+            """)
+            conn.commit()
+
+
+def timed(fn, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    sizes = [int(size) for size in sys.argv[1:]] or [10, 1000, 10000]
+    base_dbname = os.getenv("DB_NAME")
+    bench_dbname = f"{base_dbname}_introspection_bench"
+
+    adapter = PostgresAdapter()
+    adapter.recreate_database_psycopg2(
+        bench_dbname, os.getenv("DB_USER"), os.getenv("DB_PASSWORD"), os.getenv("DB_HOST"), os.getenv("DB_PORT")
+    )
+    os.environ["DB_NAME"] = bench_dbname
+
+    print(f"{'tables':>8} | {'information_schema':>20} | {'pg_catalog':>12} | {'speedup':>8}")
+    try:
+        for size in sizes:
+            build_schema(adapter, size)
+            legacy_seconds, legacy = timed(adapter.get_information_schema_schemas, repeat=1 if size > 1000 else 3)
+            catalog_seconds, catalog = timed(adapter.get_catalog_schemas)
+            assert legacy.keys() == catalog.keys(), "introspection results differ"
+            print(
+                f"{size:>8} | {legacy_seconds * 1000:>17.1f} ms | {catalog_seconds * 1000:>9.1f} ms | "
+                f"{legacy_seconds / catalog_seconds:>7.1f}x"
+            )
+    finally:
+        os.environ["DB_NAME"] = base_dbname
+
+
+if __name__ == "__main__":
+    main()
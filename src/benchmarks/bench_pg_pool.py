@@ -0,0 +1,97 @@
+"""
+Handshake time saved by the pooled PostgresAdapter over one simulated workflow.
+
+Replays the adapter calls made by a `/api/test_db` request followed by a workflow run
+(check_db, check_permissions and several get_schemas_from_db calls) against the database
+configured through the usual DB_* environment variables. The workflows run twice: once with
+idle connections never reused (every checkout connects, as without a pool) and once pooled.
+Connections are counted and timed by wrapping psycopg2.connect, so whatever the adapter
+actually opens is measured.
+
+    python src/benchmarks/bench_pg_pool.py [workflows]
+"""
+import os
+import sys
+import time
+from contextlib import contextmanager
+from unittest import mock
+
+import psycopg2
+
+from revolve.db.postgres_adapter import PostgresAdapter, get_connection_pool
+
+
+def simulate_workflow(adapter):
+    config = dict(
+        db_name=os.getenv("DB_NAME"),
+        db_user=os.getenv("DB_USER"),
+        db_password=os.getenv("DB_PASSWORD"),
+        db_host=os.getenv("DB_HOST"),
+        db_port=os.getenv("DB_PORT"),
+    )
+    # /api/test_db
+    adapter.check_db(**config)
+    adapter.check_permissions()
+    adapter.get_schemas_from_db()
+    # run_workflow -> router_node (clone_db) -> generate_prompt_for_code_generation
+    adapter.check_db(**config)
+    adapter.get_schemas_from_db()
+    adapter.get_schemas_from_db()
+
+
+@contextmanager
+def counted_connects():
+    """Count and time every psycopg2.connect made inside the block."""
+    counts = {"connects": 0, "seconds": 0.0}
+    connect = psycopg2.connect
+
+    def counting_connect(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return connect(*args, **kwargs)
+        finally:
+            counts["connects"] += 1
+            counts["seconds"] += time.perf_counter() - started
+
+    with mock.patch.object(psycopg2, "connect", counting_connect):
+        yield counts
+
+
+def run(adapter, pool, workflows, reuse):
+    pool.close_idle()
+    idle_timeout = pool.idle_timeout
+    pool.idle_timeout = idle_timeout if reuse else -1  # -1: every idle connection is recycled on checkout
+    try:
+        with counted_connects() as counts:
+            started = time.perf_counter()
+            for _ in range(workflows):
+                simulate_workflow(adapter)
+            elapsed = time.perf_counter() - started
+    finally:
+        pool.idle_timeout = idle_timeout
+    return counts, elapsed
+
+
+def main():
+    workflows = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    adapter = PostgresAdapter()
+    pool = get_connection_pool(
+        os.getenv("DB_NAME"), os.getenv("DB_USER"), os.getenv("DB_PASSWORD"), os.getenv("DB_HOST"), os.getenv("DB_PORT")
+    )
+
+    unpooled, unpooled_elapsed = run(adapter, pool, workflows, reuse=False)
+    pooled, pooled_elapsed = run(adapter, pool, workflows, reuse=True)
+
+    handshake = unpooled["seconds"] / max(unpooled["connects"], 1)
+    print(f"average handshake:              {handshake * 1000:8.2f} ms")
+    print(f"connections per workflow:       {unpooled['connects'] / workflows:8.1f} (unpooled)")
+    print(f"connections per workflow:       {pooled['connects'] / workflows:8.1f} (pooled)")
+    print(f"handshake time per workflow:    {unpooled['seconds'] / workflows * 1000:8.2f} ms (unpooled)")
+    print(f"handshake time per workflow:    {pooled['seconds'] / workflows * 1000:8.2f} ms (pooled)")
+    print(f"saved per workflow:             {(unpooled['seconds'] - pooled['seconds']) / workflows * 1000:8.2f} ms")
+    print(f"total run time:                 {unpooled_elapsed * 1000:8.2f} ms unpooled, "
+          f"{pooled_elapsed * 1000:8.2f} ms pooled for {workflows} workflows")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,7 +10,7 @@ from socketserver import ThreadingMixIn
 
 from revolve.db import get_adapter
 from revolve.workflow_generator import run_workflow_generator
-from revolve.utils import start_process, stop_process
+from revolve.utils import log, start_process, stop_process
 from revolve.utils import read_python_code
 from revolve.functions import get_file_list
 from wsgiref.simple_server import WSGIRequestHandler
@@ -215,10 +215,28 @@ class TestDBResource:
             schemas = adapter.get_schemas_from_db()
             table_names = list(schemas.keys())
             random.shuffle(table_names)
+            # Statistics are informational; a failure to read them must not fail the connection test.
+            try:
+                statistics_by_table = adapter.get_table_statistics()
+            except Exception as e:
+                log(f"Could not read table statistics: {e}")
+                statistics_by_table = {}
+            table_statistics = {
+                table: {
+                    "estimated_rows": statistics.get("estimated_rows"),
+                    "total_bytes": statistics.get("total_bytes"),
+                    "indexes": len(statistics.get("indexes", [])),
+                }
+                for table, statistics in statistics_by_table.items()
+            }
             
             if result:
                 resp.status = falcon.HTTP_200
-                resp.media = {"message": "Connection to DB was successful!", "tables": table_names}
+                resp.media = {
+                    "message": "Connection to DB was successful!",
+                    "tables": table_names,
+                    "table_statistics": table_statistics,
+                }
             else:
                 resp.status = falcon.HTTP_500
                 resp.media = {"error": "Connection to DB failed. Please check your credentials."}
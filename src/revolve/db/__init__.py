@@ -1,7 +1,37 @@
+import atexit
 import importlib
+import os
+import threading
 from revolve.db.adapter import DatabaseAdapter
 
+CONNECTION_ENV_VARS = ("DB_NAME", "DB_USER", "DB_PASSWORD", "DB_HOST", "DB_PORT")
+
+# (db_type, connection config) -> adapter. Adapters own pools and clients, so they are shared and long-lived.
+_adapters = {}
+_adapters_lock = threading.Lock()
+
+
 def get_adapter(db_type: str = "postgres") -> DatabaseAdapter:
+    """
+    Return the shared adapter for `db_type` and the current DB_* connection settings. When the settings change,
+    adapters of that type built for the old settings are closed and replaced.
+    """
+    key = (db_type, tuple(os.getenv(name) for name in CONNECTION_ENV_VARS))
+
+    with _adapters_lock:
+        adapter = _adapters.get(key)
+        if adapter is not None:
+            return adapter
+
+        for stale_key in [k for k in _adapters if k[0] == db_type]:
+            _close_adapter(_adapters.pop(stale_key))
+
+        adapter = _load_adapter(db_type)
+        _adapters[key] = adapter
+        return adapter
+
+
+def _load_adapter(db_type: str) -> DatabaseAdapter:
     module_name = f"revolve.db.{db_type}_adapter"
     class_name = f"{db_type.capitalize()}Adapter"
 
@@ -10,4 +40,26 @@ def get_adapter(db_type: str = "postgres") -> DatabaseAdapter:
         adapter_class = getattr(module, class_name)
         return adapter_class()
     except (ModuleNotFoundError, AttributeError) as e:
-        raise ImportError(f"Could not load adapter for '{db_type}': {e}")
\ No newline at end of file
+        raise ImportError(f"Could not load adapter for '{db_type}': {e}")
+
+
+def _close_adapter(adapter):
+    try:
+        adapter.close()
+    except Exception as e:
+        print(f"Error closing {type(adapter).__name__}: {e}")
+
+
+def close_adapters():
+    """Close every registered adapter; called automatically at interpreter shutdown."""
+    with _adapters_lock:
+        while _adapters:
+            _close_adapter(_adapters.popitem()[1])
+
+
+def live_adapter_count() -> int:
+    with _adapters_lock:
+        return len(_adapters)
+
+
+atexit.register(close_adapters)
@@ -38,6 +38,21 @@ class DatabaseAdapter(ABC):
         """
         pass
 
+    @abstractmethod
+    def close(self):
+        """
+        Release the connections, pools and clients held by this adapter.
+        """
+        pass
+
+    @abstractmethod
+    def get_table_statistics(self) -> Dict[str, Any]:
+        """
+        Fetch planner statistics per table: estimated row count, size on disk, existing indexes and
+        per-column selectivity. Used to steer generated list endpoints towards indexed filters.
+        """
+        pass
+
     @abstractmethod
     def order_tables_by_dependencies(self, dependencies: Dict[str, Any]) -> List[str]:
         """
@@ -93,7 +108,8 @@ class DatabaseAdapter(ABC):
             password,
             host="localhost",
             port=5432,
-            recreate_db=False
+            recreate_db=False,
+            streaming=True
     ):
         """
         Restore a database schema from a dump file using psycopg2.
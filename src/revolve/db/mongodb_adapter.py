@@ -1,11 +1,19 @@
 from typing import Dict, Any, List
 from abc import ABC
 from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure
+from pymongo.errors import ConnectionFailure, ExecutionTimeout, OperationFailure
+from bson import json_util
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import hashlib
+import math
 import os
 import json
+import time
 
+from revolve.utils import log
 from revolve.db.adapter import db_tool
+from revolve.db.mongodb_schema import infer_schema
+from revolve.db.schema_cache import schema_cache
 
 
 class MongodbAdapter(ABC):
@@ -23,13 +31,20 @@ class MongodbAdapter(ABC):
         )
         self.db_name = os.getenv("DB_NAME")
         self.db = self.client[self.db_name]
+        self.last_clone_report = None
+
+    def close(self):
+        """Close the MongoClient, its connection pool and monitor threads."""
+        self.client.close()
 
     def get_raw_schemas(self) -> Dict[str, Any]:
         """
-        Retrieve detailed JSON schema validator information from MongoDB collections.
+        Retrieve detailed JSON schema validator information from MongoDB collections. Collections without a
+        validator get a schema inferred from a $sample of their documents, several collections at a time.
         """
         schema_info = {}
         collections = self.db.command("listCollections")["cursor"]["firstBatch"]
+        to_infer = []
 
         for collection in collections:
             name = collection["name"]
@@ -40,18 +55,45 @@ class MongodbAdapter(ABC):
             if json_schema:
                 schema_info[name] = json_schema
             else:
-                # Fall back to simple type extraction from a sample doc if no validator exists
-                sample_doc = self.db[name].find_one()
-                if sample_doc:
-                    schema_info[name] = {
-                        "bsonType": "object",
-                        "properties": {
-                            k: {"bsonType": type(v).__name__} for k, v in sample_doc.items()
-                        }
-                    }
+                to_infer.append(name)
+
+        workers = max(1, min(len(to_infer), int(os.getenv("MONGO_SCHEMA_WORKERS", 4))))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for name, json_schema in zip(to_infer, executor.map(self.infer_collection_schema, to_infer)):
+                if json_schema:
+                    schema_info[name] = json_schema
 
         return schema_info
 
+    def infer_collection_schema(self, name: str) -> Dict[str, Any]:
+        """
+        Infer a collection's schema from at most MONGO_SCHEMA_SAMPLE_SIZE randomly sampled documents, stopping
+        early once MONGO_SCHEMA_TIME_BUDGET_MS has been spent. Returns None for an empty collection.
+        """
+        sample_size = int(os.getenv("MONGO_SCHEMA_SAMPLE_SIZE", 1000))
+        budget_ms = int(os.getenv("MONGO_SCHEMA_TIME_BUDGET_MS", 5000))
+        deadline = time.monotonic() + budget_ms / 1000
+        documents = []
+
+        try:
+            with self.db[name].aggregate([{"$sample": {"size": sample_size}}], maxTimeMS=budget_ms) as cursor:
+                for document in cursor:
+                    documents.append(document)
+                    if time.monotonic() >= deadline:
+                        log(f"⏱️ Schema sampling of '{name}' hit its time budget after {len(documents)} documents")
+                        break
+        except ExecutionTimeout:
+            log(f"⏱️ Schema sampling of '{name}' timed out after {budget_ms} ms")
+
+        if not documents:
+            # An empty collection, or a sample that could not finish in time: one document still beats nothing.
+            sample_doc = self.db[name].find_one(max_time_ms=budget_ms)
+            if not sample_doc:
+                return None
+            documents.append(sample_doc)
+
+        return infer_schema(documents)
+
     def get_table_dependencies(self):
         """
         MongoDB does not enforce foreign key relationships, so this method will return an empty dependency map.
@@ -62,7 +104,22 @@ class MongodbAdapter(ABC):
         """
         Fetch processed schema information from MongoDB.
         """
-        return self.get_raw_schemas()
+        cache_key = (
+            "mongodb", os.getenv("DB_HOST"), os.getenv("DB_PORT"), self.db_name, os.getenv("DB_USER"),
+            os.getenv("MONGO_SCHEMA_SAMPLE_SIZE", "1000"),
+        )
+        return schema_cache.get(cache_key, self.get_schema_fingerprint(), self.get_raw_schemas)
+
+    def get_schema_fingerprint(self) -> str:
+        """
+        Hash of the listCollections output (names, options and validators). It changes whenever a collection
+        is created, dropped or has its validator altered.
+        """
+        collections = sorted(
+            ({"name": c["name"], "options": c.get("options", {})} for c in self.db.list_collections()),
+            key=lambda c: c["name"],
+        )
+        return hashlib.sha256(json_util.dumps(collections).encode("utf-8")).hexdigest()
 
     def order_tables_by_dependencies(self, dependencies: Dict[str, Any]) -> List[str]:
         """
@@ -76,6 +133,53 @@ class MongodbAdapter(ABC):
         """
         return sorted(dependencies.keys())
 
+    def get_table_statistics(self) -> Dict[str, Any]:
+        """
+        Document counts, sizes and indexes per collection, read with $collStats and listIndexes for
+        MONGO_SCHEMA_WORKERS collections at a time. Uses the same shape as the Postgres adapter:
+        {collection: {"estimated_rows", "total_bytes", "storage_bytes", "indexes": [...], "columns": {}}}.
+        """
+        names = [
+            c["name"] for c in self.db.list_collections(filter={"type": "collection"})
+            if not c["name"].startswith("system.")
+        ]
+        workers = max(1, min(len(names), int(os.getenv("MONGO_SCHEMA_WORKERS", 4))))
+        statistics = {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for name, collection_statistics in zip(names, executor.map(self._collection_statistics, names)):
+                statistics[name] = collection_statistics
+        return statistics
+
+    def _collection_statistics(self, name: str) -> Dict[str, Any]:
+        try:
+            # One document per shard; unsharded deployments return a single one.
+            shards = [
+                stats["storageStats"]
+                for stats in self.db[name].aggregate([{"$collStats": {"storageStats": {}}}])
+            ]
+        except OperationFailure:
+            shards = [self.db.command("collStats", name)]
+
+        indexes = []
+        for index in self.db[name].list_indexes():
+            kinds = {value for value in index["key"].values() if isinstance(value, str)}
+            indexes.append({
+                "name": index["name"],
+                "columns": list(index["key"].keys()),
+                "unique": bool(index.get("unique")) or index["name"] == "_id_",
+                "primary": index["name"] == "_id_",
+                "method": kinds.pop() if len(kinds) == 1 else "btree",
+                "sparse": bool(index.get("sparse") or index.get("partialFilterExpression")),
+            })
+
+        return {
+            "estimated_rows": sum(shard.get("count", 0) for shard in shards),
+            "total_bytes": sum(shard.get("size", 0) + shard.get("totalIndexSize", 0) for shard in shards),
+            "storage_bytes": sum(shard.get("storageSize", 0) for shard in shards),
+            "indexes": indexes,
+            "columns": {},
+        }
+
     @db_tool
     def get_tables(self) -> List[Dict[str, Any]]:
         """
@@ -83,13 +187,82 @@ class MongodbAdapter(ABC):
         """
         return list(self.db.list_collections())
 
+    @db_tool
+    def run_read_only_query(self, collection: str, find_filter: str = "{}", pipeline: str = "") -> str:
+        """
+        This function runs a read-only query on a MongoDB collection and returns at most the first documents.
+        Give either a find filter or an aggregation pipeline, as (extended) JSON. Write stages ($out, $merge)
+        are rejected. Filter and $limit queries to what you need; "truncated" tells whether documents were left out.
+        Args:
+            collection (str): The collection to query.
+            find_filter (str): A find filter, e.g. {"status": "active"}.
+            pipeline (str): An aggregation pipeline, e.g. [{"$match": {...}}, {"$group": {...}}]. Used instead of find_filter when given.
+        """
+        max_documents = int(os.getenv("QUERY_TOOL_MAX_ROWS", 200))
+        max_bytes = int(os.getenv("QUERY_TOOL_MAX_BYTES", 65536))
+        max_time_ms = int(os.getenv("QUERY_TOOL_STATEMENT_TIMEOUT_MS", 15000))
+        batch_size = min(max_documents + 1, 1000)
+
+        documents, size = [], 0
+        documents_read, truncated_reason = 0, None
+        try:
+            if pipeline:
+                stages = json_util.loads(pipeline)
+                if not isinstance(stages, list):
+                    raise ValueError("pipeline must be a JSON array of stages")
+                write_stage = _find_write_stage(stages)
+                if write_stage:
+                    raise ValueError(f"{write_stage} stages are not allowed")
+                # The extra document only tells us the result was cut off.
+                cursor = self.db[collection].aggregate(
+                    stages + [{"$limit": max_documents + 1}], maxTimeMS=max_time_ms, batchSize=batch_size
+                )
+            else:
+                query_filter = json_util.loads(find_filter or "{}")
+                write_stage = _find_write_stage(query_filter)
+                if write_stage:
+                    raise ValueError(f"{write_stage} is not allowed")
+                cursor = self.db[collection].find(
+                    query_filter, limit=max_documents + 1, max_time_ms=max_time_ms, batch_size=batch_size
+                )
+
+            with cursor:
+                for document in cursor:
+                    documents_read += 1
+                    if len(documents) >= max_documents:
+                        truncated_reason = "max_rows"
+                        break
+                    document_size = len(json_util.dumps(document)) + 1
+                    if size + document_size > max_bytes:
+                        truncated_reason = "max_bytes"
+                        break
+                    documents.append(document)
+                    size += document_size
+
+        except Exception as e:
+            log(f"Error running query: {e}")
+            return f"Error running query: {e}"
+
+        return json_util.dumps({
+            "documents": documents,
+            "document_count": len(documents),
+            "documents_read": documents_read,
+            "truncated": truncated_reason is not None,
+            "truncated_reason": truncated_reason,
+        })
+
     def run_query_on_db(self, query: str) -> str:
         """
         Execute a query on a MongoDB collection.
         Args:
-            query (Dict): A dictionary containing the collection name and query parameters.
+            query (str): JSON object with "collection" and either "filter" or "pipeline".
         """
-        raise RuntimeError("run_query_on_db is not supported")
+        request = json_util.loads(query)
+        return self.run_read_only_query(
+            request["collection"],
+            json_util.dumps(request.get("filter", {})),
+            json_util.dumps(request["pipeline"]) if request.get("pipeline") else "",
+        )
 
     def check_db(self, db_name: str, db_user: str, db_password: str, db_host: str, db_port: str) -> bool:
         """
@@ -137,16 +310,123 @@ class MongodbAdapter(ABC):
 
     def clone_db(self):
         """
-        Clone an existing MongoDB database by copying all collections and documents.
+        Clone the database into <DB_NAME>_test, several collections at a time (CLONE_DB_WORKERS). Each collection
+        is created with its original options (validator, collation, capping, ...), filled server-side with a
+        $merge aggregation when MONGO_CLONE_SERVER_SIDE allows it, otherwise streamed in bounded batches, and
+        then gets its indexes rebuilt. CLONE_DB_SAMPLE limits documents per collection like for Postgres.
         """
         new_dbname = f"{self.db_name}_test"
-        self.client.drop_database(new_dbname) 
-        new_db = self.client[new_dbname] # Drop the new database if it exists
-        for collection_name in self.db.list_collection_names():
-            documents = list(self.db[collection_name].find())
-            if documents:
-                new_db[collection_name].insert_many(documents)
+        started = time.perf_counter()
+        self.client.drop_database(new_dbname)  # Drop the new database if it exists
+        new_db = self.client[new_dbname]
+
+        collections = list(self.db.list_collections(filter={"name": {"$not": {"$regex": r"^system\."}}}))
+        views = [c for c in collections if c.get("type") == "view"]
+        collections = [c for c in collections if c.get("type") != "view"]
+        samples = self.clone_sample_config()
+        workers = max(1, min(len(collections), int(os.getenv("CLONE_DB_WORKERS", 4))))
+
+        paths = set()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(
+                    self._clone_collection, collection, new_db, samples.get(collection["name"], samples.get("*"))
+                ): collection["name"]
+                for collection in collections
+            }
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    path, documents = future.result()
+                    paths.add(path)
+                    log(f"📥 Copied {documents} documents into '{name}' ({path})")
+                except Exception as e:
+                    log(f"❌ Failed to clone collection '{name}': {e}")
+
+        # Views only store their pipeline; they are created once the collections they read from exist.
+        for view in views:
+            try:
+                new_db.command({"create": view["name"], **view.get("options", {})})
+            except OperationFailure as e:
+                log(f"❌ Failed to create view '{view['name']}': {e}")
+
         os.environ["DB_NAME_TEST"] = new_dbname
+        self.last_clone_report = {
+            "strategy": "+".join(sorted(paths)) or "empty",
+            "database": new_dbname,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+        log(f"⏱️ Cloned '{self.db_name}' into '{new_dbname}' in {self.last_clone_report['seconds']}s")
+        return self.last_clone_report
+
+    def clone_sample_config(self) -> Dict[str, Any]:
+        """
+        Per-collection sampling from CLONE_DB_SAMPLE, e.g. '{"*": 10000, "events": "1%"}'. An integer keeps at most
+        that many documents, a percentage draws a random $sample of that share of the collection.
+        """
+        raw = os.getenv("CLONE_DB_SAMPLE")
+        if not raw:
+            return {}
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"CLONE_DB_SAMPLE is not valid JSON: {e}")
+
+    def _clone_collection(self, collection: Dict[str, Any], new_db, sample=None):
+        name = collection["name"]
+        source = self.db[name]
+        new_db.command({"create": name, **collection.get("options", {})})
+
+        pipeline = []
+        if isinstance(sample, str) and sample.endswith("%"):
+            size = math.ceil(source.estimated_document_count() * float(sample.rstrip("%")) / 100)
+            pipeline.append({"$sample": {"size": size}})
+        elif sample is not None:
+            pipeline.append({"$limit": int(sample)})
+
+        path, documents = None, 0
+        if os.getenv("MONGO_CLONE_SERVER_SIDE", "true").lower() == "true":
+            try:
+                # Documents go straight from the source to the clone without passing through this process.
+                source.aggregate(
+                    pipeline + [{"$merge": {"into": {"db": new_db.name, "coll": name}, "whenMatched": "keepExisting"}}],
+                    bypassDocumentValidation=True,
+                )
+                path, documents = "merge", new_db[name].estimated_document_count()
+            except OperationFailure as e:
+                log(f"↩️ Server-side copy of '{name}' not possible, streaming instead: {e}")
+                new_db[name].delete_many({})
+
+        if path is None:
+            path, documents = "stream", self._stream_collection(source, new_db[name], pipeline)
+
+        indexes = [
+            {key: value for key, value in index.items() if key not in ("v", "ns")}
+            for index in source.list_indexes()
+            if index["name"] != "_id_"
+        ]
+        if indexes:
+            new_db.command("createIndexes", name, indexes=indexes)
+
+        return path, documents
+
+    @staticmethod
+    def _stream_collection(source, target, pipeline) -> int:
+        """Copy documents through the cursor in MONGO_CLONE_BATCH_SIZE batches of unordered inserts."""
+        batch_size = int(os.getenv("MONGO_CLONE_BATCH_SIZE", 1000))
+        cursor = source.aggregate(pipeline, batchSize=batch_size) if pipeline else source.find(batch_size=batch_size)
+        copied, batch = 0, []
+        with cursor:
+            for document in cursor:
+                batch.append(document)
+                if len(batch) >= batch_size:
+                    target.insert_many(batch, ordered=False, bypass_document_validation=True)
+                    copied += len(batch)
+                    batch = []
+        if batch:
+            target.insert_many(batch, ordered=False, bypass_document_validation=True)
+            copied += len(batch)
+        return copied
 
     def extract_permissions(self, result_data):
         """
@@ -162,4 +442,24 @@ class MongodbAdapter(ABC):
             self.client.admin.command("usersInfo")
             return {"status": "success", "message": "User has necessary permissions."}
         except Exception as e:
-            return {"status": "error", "message": str(e)}
\ No newline at end of file
+            return {"status": "error", "message": str(e)}
+
+
+_WRITE_STAGES = ("$out", "$merge")
+
+
+def _find_write_stage(value):
+    """Return the first $out/$merge found anywhere in a pipeline or filter, including nested sub-pipelines."""
+    if isinstance(value, dict):
+        for key, nested in value.items():
+            if key in _WRITE_STAGES:
+                return key
+            found = _find_write_stage(nested)
+            if found:
+                return found
+    elif isinstance(value, list):
+        for nested in value:
+            found = _find_write_stage(nested)
+            if found:
+                return found
+    return None
@@ -0,0 +1,103 @@
+import datetime
+from collections import Counter
+from typing import Any, Dict, Iterable
+
+from bson import Binary, Decimal128, Int64, ObjectId, Regex, Timestamp
+
+# Elements looked at per array value; enough to see the element shapes without walking huge arrays.
+MAX_ARRAY_ITEMS = 50
+
+
+def bson_type(value: Any) -> str:
+    """The $jsonSchema bsonType alias of a decoded BSON value."""
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, Int64):
+        return "long"
+    if isinstance(value, int):
+        return "int" if -2 ** 31 <= value < 2 ** 31 else "long"
+    if isinstance(value, float):
+        return "double"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, dict):
+        return "object"
+    if isinstance(value, (list, tuple)):
+        return "array"
+    if isinstance(value, datetime.datetime):
+        return "date"
+    if isinstance(value, ObjectId):
+        return "objectId"
+    if isinstance(value, Decimal128):
+        return "decimal"
+    if isinstance(value, (bytes, Binary)):
+        return "binData"
+    if isinstance(value, Timestamp):
+        return "timestamp"
+    if isinstance(value, Regex):
+        return "regex"
+    return type(value).__name__
+
+
+class SchemaAccumulator:
+    """
+    Merges the values observed for one field (or for the elements of an array) across sampled documents:
+    how often each type occurs, whether null was seen, and the shape of nested documents and array elements.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.types = Counter()
+        self.documents = 0
+        self.properties: Dict[str, "SchemaAccumulator"] = {}
+        self.items = None
+
+    def add(self, value: Any):
+        self.count += 1
+        value_type = bson_type(value)
+        self.types[value_type] += 1
+        if value_type == "object":
+            self.documents += 1
+            for key, field_value in value.items():
+                self.properties.setdefault(key, SchemaAccumulator()).add(field_value)
+        elif value_type == "array":
+            if self.items is None:
+                self.items = SchemaAccumulator()
+            for item in value[:MAX_ARRAY_ITEMS]:
+                self.items.add(item)
+
+    def to_schema(self, parent_count: int = None) -> Dict[str, Any]:
+        observed = [name for name, _ in self.types.most_common() if name != "null"] or ["null"]
+        schema: Dict[str, Any] = {"bsonType": observed[0] if len(observed) == 1 else observed}
+        if parent_count:
+            schema["frequency"] = round(self.count / parent_count, 3)
+        if "null" in self.types:
+            schema["nullable"] = True
+        if self.properties:
+            schema["properties"] = {
+                key: field.to_schema(self.documents) for key, field in self.properties.items()
+            }
+            required = [
+                key for key, field in self.properties.items()
+                if field.count == self.documents and "null" not in field.types
+            ]
+            if required:
+                schema["required"] = required
+        if self.items is not None and self.items.count:
+            schema["items"] = self.items.to_schema()
+        return schema
+
+
+def infer_schema(documents: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Infer a $jsonSchema-style description from sampled documents. Each field carries its observed bsonType(s),
+    the fraction of parent documents that contain it ("frequency") and whether null was seen ("nullable").
+    """
+    root = SchemaAccumulator()
+    for document in documents:
+        root.add(document)
+    schema = root.to_schema()
+    schema["sample_size"] = root.count
+    return schema
@@ -1,19 +1,158 @@
 import datetime
 import json
 import os
+import re
 import sys
+import threading
+import time
+import uuid
 from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from pathlib import Path
 from typing import Dict, List, Any
 
 import psycopg2
 import sqlparse
-from psycopg2 import sql, errors
+from psycopg2 import sql, errors, extensions
 
 # Add parent directory to sys.path
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 from revolve.utils import log
 from revolve.db.adapter import DatabaseAdapter, db_tool
+from revolve.db.schema_cache import schema_cache
+from revolve.db.sql_stream import SqlStatementReader
+
+
+class PostgresConnectionPool:
+    """
+    Bounded pool of psycopg2 connections for a single connection config.
+    Idle connections are recycled after `idle_timeout` seconds and pinged before they are handed out.
+    """
+
+    def __init__(self, config: Dict[str, Any], max_size=5, idle_timeout=300.0, acquire_timeout=30.0, pre_ping=True):
+        self.config = dict(config)
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.acquire_timeout = acquire_timeout
+        self.pre_ping = pre_ping
+        self._idle = deque()  # (connection, last_used)
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self.stats = {"connects": 0, "reuses": 0, "recycled": 0, "connect_seconds": 0.0}
+
+    @contextmanager
+    def connection(self, autocommit=False):
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise RuntimeError(
+                f"Timed out after {self.acquire_timeout}s waiting for a connection to '{self.config['dbname']}'"
+            )
+        try:
+            conn = self._checkout()
+            conn.autocommit = autocommit
+        except Exception:
+            self._slots.release()
+            raise
+
+        try:
+            yield conn
+        finally:
+            # Rolls back anything left open; connections that can no longer be used are discarded.
+            self._checkin(conn)
+            self._slots.release()
+
+    def _checkout(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                conn, last_used = self._idle.pop()
+
+            if conn.closed or time.monotonic() - last_used > self.idle_timeout:
+                self._discard(conn, recycled=True)
+                continue
+            if self.pre_ping and not self._ping(conn):
+                self._discard(conn, recycled=True)
+                continue
+
+            with self._lock:
+                self.stats["reuses"] += 1
+            return conn
+
+        started = time.perf_counter()
+        conn = psycopg2.connect(**self.config)
+        with self._lock:
+            self.stats["connects"] += 1
+            self.stats["connect_seconds"] += time.perf_counter() - started
+        return conn
+
+    def _checkin(self, conn):
+        if conn.closed:
+            return
+        try:
+            if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            conn.autocommit = False
+        except Exception:
+            self._discard(conn)
+            return
+        with self._lock:
+            self._idle.append((conn, time.monotonic()))
+
+    def _discard(self, conn, recycled=False):
+        if recycled:
+            with self._lock:
+                self.stats["recycled"] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _ping(conn) -> bool:
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            return True
+        except Exception:
+            return False
+
+    def close_idle(self):
+        """Close every idle connection, e.g. before the database is dropped or used as a template."""
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for conn, _ in idle:
+            self._discard(conn)
+
+
+_connection_pools: Dict[tuple, PostgresConnectionPool] = {}
+_connection_pools_lock = threading.Lock()
+
+
+def get_connection_pool(dbname, user, password, host, port) -> PostgresConnectionPool:
+    """Return the process-wide pool for the given connection config, creating it on first use."""
+    key = (host, str(port), dbname, user, password)
+    with _connection_pools_lock:
+        pool = _connection_pools.get(key)
+        if pool is None:
+            pool = PostgresConnectionPool(
+                {"dbname": dbname, "user": user, "password": password, "host": host, "port": port},
+                max_size=int(os.getenv("DB_POOL_MAX_SIZE", 5)),
+                idle_timeout=float(os.getenv("DB_POOL_IDLE_TIMEOUT", 300)),
+                acquire_timeout=float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", 30)),
+                pre_ping=os.getenv("DB_POOL_PRE_PING", "true").lower() == "true",
+            )
+            _connection_pools[key] = pool
+        return pool
+
+
+def close_connection_pools(dbname=None):
+    """Close idle pooled connections, either for one database or for all of them."""
+    with _connection_pools_lock:
+        pools = [p for p in _connection_pools.values() if dbname is None or p.config["dbname"] == dbname]
+    for pool in pools:
+        pool.close_idle()
 
 
 class PostgresAdapter(DatabaseAdapter):
@@ -25,6 +164,24 @@ class PostgresAdapter(DatabaseAdapter):
             "host": os.getenv("DB_HOST"),
             "port": os.getenv("DB_PORT"),
         }
+        self.last_clone_report = None
+
+    def close(self):
+        """Close the idle pooled connections of the configured database and its _test clone."""
+        if self.config["dbname"]:
+            close_connection_pools(self.config["dbname"])
+            close_connection_pools(self.config["dbname"] + "_test")
+
+    def _connection(self, dbname=None, user=None, password=None, host=None, port=None, autocommit=False):
+        """Borrow a pooled connection; arguments left as None fall back to the DB_* environment variables."""
+        pool = get_connection_pool(
+            dbname=dbname or os.getenv("DB_NAME"),
+            user=user or os.getenv("DB_USER"),
+            password=password or os.getenv("DB_PASSWORD"),
+            host=host or os.getenv("DB_HOST"),
+            port=port or os.getenv("DB_PORT"),
+        )
+        return pool.connection(autocommit=autocommit)
 
     def get_raw_schemas(self):
         schemas_raw = self.run_query_on_db("""
@@ -161,6 +318,43 @@ class PostgresAdapter(DatabaseAdapter):
 
 
     def get_schemas_from_db(self):
+        introspection = os.getenv("DB_SCHEMA_INTROSPECTION", "catalog")
+        cache_key = (
+            "postgres", os.getenv("DB_HOST"), os.getenv("DB_PORT"), os.getenv("DB_NAME"), os.getenv("DB_USER"),
+            introspection, os.getenv("DB_SCHEMAS", ""),
+        )
+        if introspection == "information_schema":
+            load = self.get_information_schema_schemas
+        else:
+            load = self.get_catalog_schemas
+        return schema_cache.get(cache_key, self.get_schema_fingerprint(), load)
+
+    def get_schema_fingerprint(self):
+        """
+        Cheap catalog fingerprint: row count and newest xmin of each catalog introspection reads. The xmins catch
+        added or altered rows, the counts catch deleted ones (a dropped foreign key only removes pg_constraint rows),
+        so any DDL touching tables, columns, defaults, constraints or enums changes it.
+        """
+        with self._connection() as conn, conn.cursor() as cur:
+            cur.execute("""
+            SELECT
+                (SELECT count(*) FROM pg_class),
+                (SELECT max(xmin::text::bigint) FROM pg_class),
+                (SELECT count(*) FROM pg_attribute),
+                (SELECT max(xmin::text::bigint) FROM pg_attribute),
+                (SELECT count(*) FROM pg_attrdef),
+                (SELECT max(xmin::text::bigint) FROM pg_attrdef),
+                (SELECT count(*) FROM pg_constraint),
+                (SELECT max(xmin::text::bigint) FROM pg_constraint),
+                (SELECT count(*) FROM pg_enum),
+                (SELECT max(xmin::text::bigint) FROM pg_enum)
+            """)
+            return list(cur.fetchone())
+
+    def get_information_schema_schemas(self):
+        """
+        Legacy introspection through the information_schema views: two queries whose results are merged in Python.
+        """
         schemas_raw = self.get_raw_schemas()
         dependencies_raw = self.get_table_dependencies()
 
@@ -177,75 +371,223 @@ class PostgresAdapter(DatabaseAdapter):
 
         return schemas
 
-        query_result = self.run_query_on_db("""
-    SELECT jsonb_object_agg(
-               table_name,
-               columns
-           ) AS schema_dict
-    FROM (
-        SELECT
-            c.table_name,
-            jsonb_agg(
-                jsonb_strip_nulls(
-                    jsonb_build_object(
-                        'column_name', c.column_name,
-                        'data_type', c.data_type,
-                        'data_type_s',
-                            CASE
-                                WHEN def.column_default LIKE 'nextval(%' AND pt.typname = 'int4' THEN 'serial'
-                                WHEN def.column_default LIKE 'nextval(%' AND pt.typname = 'int8' THEN 'bigserial'
-                                WHEN c.data_type IN ('character varying', 'varchar') AND c.character_maximum_length IS NOT NULL
-                                    THEN 'varchar(' || c.character_maximum_length || ')'
-                                WHEN c.data_type = 'numeric' AND c.numeric_precision IS NOT NULL
-                                    THEN 'numeric(' || c.numeric_precision ||
-                                         COALESCE(', ' || c.numeric_scale, '') || ')'
-                                ELSE c.data_type
-                            END,
-                        'is_nullable', c.is_nullable,
-                        'character_max_length', c.character_maximum_length,
-                        'numeric_precision', c.numeric_precision,
-                        'numeric_scale', c.numeric_scale,
-                        'enum_values', ev.enum_values,
-                        'foreign_key', jsonb_build_object(
-                            'foreign_table', ccu.table_name,
-                            'foreign_column', ccu.column_name
-                        )
-                    )
-                )
-            ) AS columns
-        FROM information_schema.columns c
-        LEFT JOIN information_schema.key_column_usage kcu
-            ON c.table_name = kcu.table_name
-            AND c.column_name = kcu.column_name
-            AND c.table_schema = kcu.table_schema
-        LEFT JOIN information_schema.table_constraints tc
-            ON kcu.constraint_name = tc.constraint_name
-            AND tc.constraint_type = 'FOREIGN KEY'
-        LEFT JOIN information_schema.constraint_column_usage ccu
-            ON tc.constraint_name = ccu.constraint_name
-        LEFT JOIN LATERAL (
-            SELECT jsonb_agg(e.enumlabel) AS enum_values
-            FROM pg_type t
-            JOIN pg_enum e ON t.oid = e.enumtypid
-            JOIN pg_namespace ns ON ns.oid = t.typnamespace
-            WHERE t.typname = c.udt_name
-        ) ev ON true
-        LEFT JOIN LATERAL (
+    def get_schema_names(self) -> List[str]:
+        """
+        The Postgres schemas to introspect: DB_SCHEMAS (comma separated) when set, otherwise every non-system
+        schema that holds tables.
+        """
+        configured = [name.strip() for name in os.getenv("DB_SCHEMAS", "").split(",") if name.strip()]
+        if configured:
+            return configured
+        with self._connection() as conn, conn.cursor() as cur:
+            cur.execute("""
+            SELECT DISTINCT n.nspname
+            FROM pg_class cls
+            JOIN pg_namespace n ON n.oid = cls.relnamespace
+            WHERE cls.relkind IN ('r', 'v', 'f', 'p')
+              AND n.nspname NOT IN ('pg_catalog', 'information_schema')
+              AND n.nspname NOT LIKE 'pg_toast%'
+              AND NOT pg_is_other_temp_schema(n.oid)
+            ORDER BY n.nspname
+            """)
+            return [row[0] for row in cur.fetchall()]
+
+    def get_catalog_schemas(self):
+        """
+        Read columns, defaults, enums, PK/unique constraints and foreign keys straight from pg_catalog, one query
+        per Postgres schema, run concurrently on pooled connections. Tables outside "public" are keyed
+        "schema.table". Returns the same merged dict as get_information_schema_schemas.
+        """
+        schema_names = self.get_schema_names()
+        pool = get_connection_pool(
+            os.getenv("DB_NAME"), os.getenv("DB_USER"), os.getenv("DB_PASSWORD"), os.getenv("DB_HOST"), os.getenv("DB_PORT")
+        )
+        workers = max(1, min(len(schema_names), pool.max_size))
+
+        schemas = {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for result in executor.map(self._get_catalog_schema, schema_names):
+                schemas.update(result)
+        return schemas
+
+    def _get_catalog_schema(self, schema_name: str) -> Dict[str, Any]:
+        with self._connection() as conn, conn.cursor() as cur:
+            cur.execute("""
+        WITH cols AS (
             SELECT
+                cls.oid AS relid,
+                CASE WHEN n.nspname = 'public' THEN cls.relname ELSE n.nspname || '.' || cls.relname END AS table_name,
+                a.attnum,
+                a.attname AS column_name,
+                CASE
+                    WHEN t.typtype = 'd' THEN
+                        CASE
+                            WHEN bt.typelem <> 0 AND bt.typlen = -1 THEN 'ARRAY'
+                            WHEN btn.nspname = 'pg_catalog' THEN format_type(t.typbasetype, NULL)
+                            ELSE 'USER-DEFINED'
+                        END
+                    WHEN t.typelem <> 0 AND t.typlen = -1 THEN 'ARRAY'
+                    WHEN tn.nspname = 'pg_catalog' THEN format_type(a.atttypid, NULL)
+                    ELSE 'USER-DEFINED'
+                END AS data_type,
+                COALESCE(bt.oid, t.oid) AS udt_oid,
+                COALESCE(bt.typname, t.typname) AS udt_name,
+                CASE WHEN a.attnotnull OR (t.typtype = 'd' AND t.typnotnull) THEN 'NO' ELSE 'YES' END AS is_nullable,
+                information_schema._pg_char_max_length(
+                    information_schema._pg_truetypid(a.*, t.*), information_schema._pg_truetypmod(a.*, t.*)
+                ) AS character_maximum_length,
+                information_schema._pg_numeric_precision(
+                    information_schema._pg_truetypid(a.*, t.*), information_schema._pg_truetypmod(a.*, t.*)
+                ) AS numeric_precision,
+                information_schema._pg_numeric_scale(
+                    information_schema._pg_truetypid(a.*, t.*), information_schema._pg_truetypmod(a.*, t.*)
+                ) AS numeric_scale,
                 pg_get_expr(ad.adbin, ad.adrelid) AS column_default
-            FROM pg_attribute a
-            JOIN pg_class cls ON cls.oid = a.attrelid
-            JOIN pg_attrdef ad ON ad.adrelid = a.attrelid AND ad.adnum = a.attnum
-            WHERE cls.relname = c.table_name AND a.attname = c.column_name
-            LIMIT 1
-        ) def ON true
-        LEFT JOIN pg_type pt ON pt.typname = c.udt_name
-        WHERE c.table_schema NOT IN ('pg_catalog', 'information_schema')
-        GROUP BY c.table_name
-    ) AS sub
-    """)
+            FROM pg_class cls
+            JOIN pg_namespace n ON n.oid = cls.relnamespace
+            JOIN pg_attribute a ON a.attrelid = cls.oid AND a.attnum > 0 AND NOT a.attisdropped
+            JOIN pg_type t ON t.oid = a.atttypid
+            JOIN pg_namespace tn ON tn.oid = t.typnamespace
+            LEFT JOIN pg_type bt ON t.typtype = 'd' AND bt.oid = t.typbasetype
+            LEFT JOIN pg_namespace btn ON btn.oid = bt.typnamespace
+            LEFT JOIN pg_attrdef ad ON ad.adrelid = a.attrelid AND ad.adnum = a.attnum
+            WHERE cls.relkind IN ('r', 'v', 'f', 'p')
+              AND n.nspname = %(schema)s
+              AND (pg_has_role(cls.relowner, 'USAGE')
+                   OR has_column_privilege(cls.oid, a.attnum, 'SELECT, INSERT, UPDATE, REFERENCES'))
+        ),
+        enums AS (
+            SELECT enumtypid, jsonb_agg(enumlabel ORDER BY enumsortorder) AS enum_values
+            FROM pg_enum
+            GROUP BY enumtypid
+        ),
+        keys AS (
+            SELECT con.oid, con.contype, con.conrelid, con.confrelid, k.attnum, con.confkey[k.ord] AS foreign_attnum
+            FROM pg_constraint con
+            CROSS JOIN LATERAL unnest(con.conkey) WITH ORDINALITY AS k(attnum, ord)
+            WHERE con.contype IN ('p', 'u', 'f')
+        ),
+        unique_columns AS (
+            SELECT DISTINCT conrelid, attnum FROM keys WHERE contype IN ('p', 'u')
+        ),
+        fks AS (
+            SELECT DISTINCT ON (k.conrelid, k.attnum)
+                k.conrelid,
+                k.attnum,
+                CASE WHEN fn.nspname = 'public' THEN fc.relname ELSE fn.nspname || '.' || fc.relname END AS foreign_table,
+                fa.attname AS foreign_column,
+                fu.attnum IS NOT NULL AS is_from_unique,
+                tu.attnum IS NOT NULL AS is_to_unique
+            FROM keys k
+            JOIN pg_class fc ON fc.oid = k.confrelid
+            JOIN pg_namespace fn ON fn.oid = fc.relnamespace
+            JOIN pg_attribute fa ON fa.attrelid = k.confrelid AND fa.attnum = k.foreign_attnum
+            LEFT JOIN unique_columns fu ON fu.conrelid = k.conrelid AND fu.attnum = k.attnum
+            LEFT JOIN unique_columns tu ON tu.conrelid = k.confrelid AND tu.attnum = k.foreign_attnum
+            WHERE k.contype = 'f'
+            ORDER BY k.conrelid, k.attnum, k.oid
+        )
+        SELECT jsonb_object_agg(table_name, columns) AS schema_dict
+        FROM (
+            SELECT
+                c.table_name,
+                jsonb_agg(
+                    jsonb_strip_nulls(
+                        jsonb_build_object(
+                            'column_name', c.column_name,
+                            'data_type', c.data_type,
+                            'data_type_s',
+                                CASE
+                                    WHEN c.column_default LIKE 'nextval(%%' AND c.udt_name = 'int4' THEN 'serial'
+                                    WHEN c.column_default LIKE 'nextval(%%' AND c.udt_name = 'int8' THEN 'bigserial'
+                                    WHEN c.data_type IN ('character varying', 'varchar') AND c.character_maximum_length IS NOT NULL
+                                        THEN 'varchar(' || c.character_maximum_length || ')'
+                                    WHEN c.data_type = 'numeric' AND c.numeric_precision IS NOT NULL
+                                        THEN 'numeric(' || c.numeric_precision ||
+                                             COALESCE(', ' || c.numeric_scale, '') || ')'
+                                    ELSE c.data_type
+                                END,
+                            'is_nullable', c.is_nullable,
+                            'character_max_length', c.character_maximum_length,
+                            'numeric_precision', c.numeric_precision,
+                            'numeric_scale', c.numeric_scale,
+                            'enum_values', e.enum_values,
+                            'foreign_key', jsonb_build_object(
+                                'foreign_table', fk.foreign_table,
+                                'foreign_column', fk.foreign_column
+                            ),
+                            'default_value', c.column_default,
+                            'links_to_table', fk.foreign_table,
+                            'reltype',
+                                CASE
+                                    WHEN fk.foreign_table IS NULL THEN NULL
+                                    WHEN fk.is_from_unique AND fk.is_to_unique THEN 'one-to-one'
+                                    WHEN NOT fk.is_from_unique AND fk.is_to_unique THEN 'many-to-one'
+                                    ELSE 'uncertain' -- fallback
+                                END
+                        )
+                    )
+                    ORDER BY c.attnum
+                ) AS columns
+            FROM cols c
+            LEFT JOIN enums e ON e.enumtypid = c.udt_oid
+            LEFT JOIN fks fk ON fk.conrelid = c.relid AND fk.attnum = c.attnum
+            GROUP BY c.table_name
+        ) AS sub;
+            """, {"schema": schema_name})
+            schemas = cur.fetchone()[0]
 
-        return query_result
+        return schemas or {}
+
+
+    def get_table_statistics(self) -> Dict[str, Any]:
+        """
+        Planner statistics for the introspected tables, keyed like get_schemas_from_db:
+        {table: {"estimated_rows", "analyzed", "total_bytes", "indexes": [{"name", "columns", "unique", "primary",
+        "method"}], "columns": {column: {"n_distinct", "null_frac"}}}}. estimated_rows comes from pg_class.reltuples,
+        so it is only as fresh as the last ANALYZE; a negative n_distinct is a fraction of the row count.
+        """
+        with self._connection() as conn, conn.cursor() as cur:
+            cur.execute("""
+            SELECT
+                CASE WHEN n.nspname = 'public' THEN cls.relname ELSE n.nspname || '.' || cls.relname END,
+                jsonb_build_object(
+                    'estimated_rows', GREATEST(cls.reltuples, 0)::bigint,
+                    'analyzed', cls.reltuples >= 0 AND (cls.reltuples > 0 OR cls.relpages > 0),
+                    'total_bytes', pg_total_relation_size(cls.oid),
+                    'indexes', COALESCE((
+                        SELECT jsonb_agg(
+                            jsonb_build_object(
+                                'name', ic.relname,
+                                'columns', (
+                                    SELECT jsonb_agg(pg_get_indexdef(i.indexrelid, k.ord::int, true) ORDER BY k.ord)
+                                    FROM generate_series(1, i.indnkeyatts) AS k(ord)
+                                ),
+                                'unique', i.indisunique,
+                                'primary', i.indisprimary,
+                                'method', am.amname
+                            )
+                            ORDER BY ic.relname
+                        )
+                        FROM pg_index i
+                        JOIN pg_class ic ON ic.oid = i.indexrelid
+                        JOIN pg_am am ON am.oid = ic.relam
+                        WHERE i.indrelid = cls.oid
+                    ), '[]'::jsonb),
+                    'columns', COALESCE((
+                        SELECT jsonb_object_agg(
+                            s.attname, jsonb_build_object('n_distinct', s.n_distinct, 'null_frac', s.null_frac)
+                        )
+                        FROM pg_stats s
+                        WHERE s.schemaname = n.nspname AND s.tablename = cls.relname
+                    ), '{}'::jsonb)
+                )
+            FROM pg_class cls
+            JOIN pg_namespace n ON n.oid = cls.relnamespace
+            WHERE cls.relkind IN ('r', 'p')
+              AND n.nspname = ANY(%s)
+            """, (self.get_schema_names(),))
+            return dict(cur.fetchall())
 
 
     def order_tables_by_dependencies(self, dependencies: Dict[str, Any]) -> List[str]:
@@ -312,30 +654,75 @@ class PostgresAdapter(DatabaseAdapter):
         raise RuntimeError("get_tables is not supported")
 
     @db_tool
+    def run_read_only_query(self, query: str) -> str:
+        """
+        This function runs the given read-only query on the postgres database and returns at most the first rows
+        of the result. Filter and LIMIT queries to what you need; "truncated" tells whether rows were left out.
+        Args:
+            query (str): The query to be run.
+        """
+        max_rows = int(os.getenv("QUERY_TOOL_MAX_ROWS", 200))
+        max_bytes = int(os.getenv("QUERY_TOOL_MAX_BYTES", 65536))
+        statement_timeout_ms = int(os.getenv("QUERY_TOOL_STATEMENT_TIMEOUT_MS", 15000))
+
+        rows, columns, size = [], [], 0
+        rows_read, truncated_reason = 0, None
+        try:
+            # One statement only: "SELECT 1; COMMIT; DELETE ..." would end the read-only transaction mid-query.
+            query = _single_statement(query)
+            with self._connection() as conn, _read_only_session(conn):
+                with conn.cursor() as cur:
+                    cur.execute("SET TRANSACTION READ ONLY")
+                    cur.execute("SET LOCAL statement_timeout = %s", (statement_timeout_ms,))
+
+                # Only SELECT-like statements can back a server-side cursor; SHOW/EXPLAIN results are small anyway.
+                cursor_name = f"revolve_query_{uuid.uuid4().hex}" if _DECLARABLE_QUERY.match(query) else None
+                with conn.cursor(name=cursor_name) as cur:
+                    if cursor_name:
+                        cur.itersize = min(max_rows + 1, 1000)
+                    cur.execute(query)
+                    if cur.description is not None or cursor_name:
+                        for row in cur:
+                            columns = columns or [column[0] for column in cur.description]
+                            rows_read += 1
+                            if len(rows) >= max_rows:
+                                truncated_reason = "max_rows"
+                                break
+                            row_size = len(json.dumps(row, default=default_serializer)) + 1
+                            if size + row_size > max_bytes:
+                                truncated_reason = "max_bytes"
+                                break
+                            rows.append(row)
+                            size += row_size
+                conn.rollback()
+
+        except Exception as e:
+            log(f"Error running query: {e}")
+            return f"Error running query: {e}"
+
+        return json.dumps({
+            "columns": columns,
+            "rows": rows,
+            "row_count": len(rows),
+            "rows_read": rows_read,
+            "truncated": truncated_reason is not None,
+            "truncated_reason": truncated_reason,
+        }, default=default_serializer)
+
+
     def run_query_on_db(self, query: str) -> str:
         """
-        This function runs the given query on the postgres database.
+        This function runs the given query on the postgres database and returns the full result.
         Args:
             query (str): The query to be run.
         """
         # log("run_query_on_db", f"Running query: {query}")
         try:
-            conn = psycopg2.connect(
-                dbname=os.getenv("DB_NAME"),
-                user=os.getenv("DB_USER"),
-                password=os.getenv("DB_PASSWORD"),
-                host=os.getenv("DB_HOST"),
-                port=os.getenv("DB_PORT"),
-            )
-            cur = conn.cursor()
-            cur.execute(query)
-            # if cur.rowcount:
-            result = cur.fetchall()
-            # else:
-            #     result = None
-            conn.commit()
-            cur.close()
-            conn.close()
+            with self._connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(query)
+                    result = cur.fetchall()
+                conn.commit()
 
         except Exception as e:
             log(f"Error running query: {e}")
@@ -358,14 +745,9 @@ class PostgresAdapter(DatabaseAdapter):
         """
         log("Testing database connection...")
         try:
-            conn = psycopg2.connect(
-                dbname=db_name,
-                user=db_user,
-                password=db_password,
-                host=db_host,
-                port=db_port,
-            )
-            conn.close()
+            # Borrowing a connection pings it, so a pooled connection proves the config still works.
+            with self._connection(db_name, db_user, db_password, db_host, db_port):
+                pass
         except Exception as e:
             log(f"Database connection failed: {e}", level="ERROR")
             return False
@@ -375,27 +757,22 @@ class PostgresAdapter(DatabaseAdapter):
 
     def recreate_database_psycopg2(self, dbname, user, password, host, port):
         """Drop and recreate the target database using psycopg2."""
-        conn = psycopg2.connect(
-            dbname="postgres",  # connect to control DB
-            user=user,
-            password=password,
-            host=host,
-            port=port
-        )
-        conn.set_session(autocommit=True)
-        with conn.cursor() as cur:
-            try:
-                cur.execute(f"DROP DATABASE IF EXISTS {dbname};")
-                print(f"✅ Dropped database '{dbname}'")
-            except Exception as e:
-                print(f"⚠️ Failed to drop: {e}")
-            try:
-                cur.execute(f"CREATE DATABASE {dbname};")
-                print(f"✅ Created database '{dbname}'")
-            except Exception as e:
-                print(f"❌ Failed to create database: {e}")
-                raise
-        conn.close()
+        # Our own idle connections would otherwise block the DROP.
+        close_connection_pools(dbname)
+        # connect to control DB
+        with self._connection("postgres", user, password, host, port, autocommit=True) as conn:
+            with conn.cursor() as cur:
+                try:
+                    cur.execute(f"DROP DATABASE IF EXISTS {dbname};")
+                    print(f"✅ Dropped database '{dbname}'")
+                except Exception as e:
+                    print(f"⚠️ Failed to drop: {e}")
+                try:
+                    cur.execute(f"CREATE DATABASE {dbname};")
+                    print(f"✅ Created database '{dbname}'")
+                except Exception as e:
+                    print(f"❌ Failed to create database: {e}")
+                    raise
 
 
     def restore_schema_with_psycopg2(
@@ -406,47 +783,131 @@ class PostgresAdapter(DatabaseAdapter):
         password,
         host="localhost",
         port=5432,
-        recreate_db=False
+        recreate_db=False,
+        streaming=True
     ):
+        """
+        Restore a plain SQL dump. In streaming mode (default) statements are split incrementally from the file,
+        committed in batches of RESTORE_BATCH_SIZE and COPY ... FROM stdin blocks are streamed to the server,
+        so memory stays flat regardless of dump size. streaming=False keeps the read-everything path.
+        """
         if recreate_db:
-            self.recreate_database_psycopg2(self, dbname, user, password, host, port)
+            self.recreate_database_psycopg2(dbname, user, password, host, port)
+
+        if streaming:
+            return self._restore_streaming(dump_file, dbname, user, password, host, port)
 
         with open(dump_file, "r") as f:
             raw_sql = f.read()
 
         statements = sqlparse.split(raw_sql)
 
-        conn = psycopg2.connect(
-            dbname=dbname,
-            user=user,
-            password=password,
-            host=host,
-            port=port
-        )
-        conn.set_session(autocommit=False)
-        with conn.cursor() as cur:
-            for stmt in statements:
-                stmt = stmt.strip()
-                if not stmt:
-                    continue
+        with self._connection(dbname, user, password, host, port) as conn:
+            with conn.cursor() as cur:
                 try:
-                    cur.execute(stmt)
-                except psycopg2.errors.DuplicateTable:
-                    print("⚠️ Table already exists. Skipped.")
-                    conn.rollback()
-                except psycopg2.errors.DuplicateObject:
-                    print("⚠️ Object already exists. Skipped.")
-                    conn.rollback()
-                except Exception as e:
-                    print(f"❌ Error executing statement:\n{stmt[:200]}...\n{e}")
-                    conn.rollback()
-                else:
-                    conn.commit()
+                    for stmt in statements:
+                        stmt = stmt.strip()
+                        if not stmt:
+                            continue
+                        self._execute_restore_statement(conn, cur, stmt)
+                finally:
+                    self._discard_session_state(conn, cur)
 
-        conn.close()
         print(f"✅ Schema restored to '{dbname}'")
 
 
+    def _restore_streaming(self, dump_file, dbname, user, password, host, port):
+        batch_size = int(os.getenv("RESTORE_BATCH_SIZE", 500))
+        progress_interval = float(os.getenv("RESTORE_PROGRESS_INTERVAL", 5))
+        total_bytes = os.path.getsize(dump_file)
+        started = last_report = time.perf_counter()
+        counts = {"executed": 0, "failed": 0}
+        batch = []
+
+        with open(dump_file, "rb") as f, self._connection(dbname, user, password, host, port) as conn, conn.cursor() as cur:
+            reader = SqlStatementReader(f)
+
+            def flush():
+                if not batch:
+                    return
+                try:
+                    for stmt in batch:
+                        cur.execute(stmt)
+                    conn.commit()
+                    counts["executed"] += len(batch)
+                except Exception:
+                    # Replay the batch one statement per transaction so only the failing ones are skipped.
+                    conn.rollback()
+                    for stmt in batch:
+                        counts["executed" if self._execute_restore_statement(conn, cur, stmt) else "failed"] += 1
+                batch.clear()
+
+            def report(final=False):
+                elapsed = max(time.perf_counter() - started, 1e-9)
+                done = counts["executed"] + counts["failed"]
+                log(
+                    f"{'✅' if final else '📦'} Restoring '{dbname}': "
+                    f"{reader.bytes_read / 1e6:.1f}/{total_bytes / 1e6:.1f} MB "
+                    f"({100 * reader.bytes_read / max(total_bytes, 1):.0f}%), "
+                    f"{done} statements ({done / elapsed:.0f}/s, {reader.bytes_read / 1e6 / elapsed:.1f} MB/s), "
+                    f"{counts['failed']} failed"
+                )
+
+            try:
+                for statement in reader:
+                    if statement.copy_data is not None:
+                        flush()
+                        try:
+                            cur.copy_expert(statement.text, statement.copy_data)
+                            conn.commit()
+                            counts["executed"] += 1
+                        except Exception as e:
+                            print(f"❌ Error executing statement:\n{statement.text[:200]}...\n{e}")
+                            conn.rollback()
+                            counts["failed"] += 1
+                    else:
+                        batch.append(statement.text)
+                        if len(batch) >= batch_size:
+                            flush()
+
+                    if time.perf_counter() - last_report >= progress_interval:
+                        last_report = time.perf_counter()
+                        report()
+                flush()
+            finally:
+                self._discard_session_state(conn, cur)
+
+        report(final=True)
+        return counts
+
+
+    @staticmethod
+    def _execute_restore_statement(conn, cur, stmt) -> bool:
+        try:
+            cur.execute(stmt)
+        except psycopg2.errors.DuplicateTable:
+            print("⚠️ Table already exists. Skipped.")
+            conn.rollback()
+        except psycopg2.errors.DuplicateObject:
+            print("⚠️ Object already exists. Skipped.")
+            conn.rollback()
+        except Exception as e:
+            print(f"❌ Error executing statement:\n{stmt[:200]}...\n{e}")
+            conn.rollback()
+        else:
+            conn.commit()
+            return True
+        return False
+
+
+    @staticmethod
+    def _discard_session_state(conn, cur):
+        """Dumps change session settings (search_path, roles, ...); reset them before the connection is pooled again."""
+        conn.rollback()
+        conn.autocommit = True
+        cur.execute("DISCARD ALL")
+
+
     def generate_create_table_sql(self, table_name: str, columns: List[Dict]) -> str:
         col_lines = []
         enum_defs = []
@@ -456,13 +917,13 @@ class PostgresAdapter(DatabaseAdapter):
             data_type = col["data_type_s"]
             column_name = col["column_name"]
 
-            # Handle user-defined enums
+            # Handle user-defined enums; for "schema.table" the type is created in the table's schema
             if data_type == "USER-DEFINED" and col.get("enum_values"):
                 enum_type_name = f"{table_name}_{column_name}_enum"
                 data_type = enum_type_name
                 enum_vals = ', '.join(f"'{v}'" for v in col["enum_values"])
                 enum_defs.append(
-                    f"DO $$ BEGIN IF NOT EXISTS (SELECT 1 FROM pg_type WHERE typname = '{enum_type_name}') "
+                    f"DO $$ BEGIN IF to_regtype('{enum_type_name}') IS NULL "
                     f"THEN CREATE TYPE {enum_type_name} AS ENUM ({enum_vals}); END IF; END $$;"
                 )
 
@@ -521,84 +982,606 @@ class PostgresAdapter(DatabaseAdapter):
     def create_database_if_not_exists(self, existing_dbname, new_dbname, user, password, host='localhost', port=5432):
         method = "create_database_if_not_exists"
         try:
-            conn = psycopg2.connect(
-                dbname=existing_dbname,
-                user=user,
-                password=password,
-                host=host,
-                port=port
-            )
-            conn.set_session(autocommit=True)
-            with conn.cursor() as cur:
-                cur.execute("SELECT 1 FROM pg_database WHERE datname = %s", (new_dbname,))
-                if cur.fetchone():
-                    log(f"ℹ️ Database '{new_dbname}' already exists.")
-                else:
-                    log(f"📦 Creating database '{new_dbname}' owned by '{user}'...")
-                    cur.execute(
-                        sql.SQL("CREATE DATABASE {} OWNER {}")
-                        .format(sql.Identifier(new_dbname), sql.Identifier(user))
-                    )
-                    log(f"✅ Database '{new_dbname}' created.")
-            conn.close()
+            with self._connection(existing_dbname, user, password, host, port, autocommit=True) as conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1 FROM pg_database WHERE datname = %s", (new_dbname,))
+                    if cur.fetchone():
+                        log(f"ℹ️ Database '{new_dbname}' already exists.")
+                    else:
+                        log(f"📦 Creating database '{new_dbname}' owned by '{user}'...")
+                        cur.execute(
+                            sql.SQL("CREATE DATABASE {} OWNER {}")
+                            .format(sql.Identifier(new_dbname), sql.Identifier(user))
+                        )
+                        log(f"✅ Database '{new_dbname}' created.")
         except Exception as e:
             raise RuntimeError(f"[{method}] ❌ Failed to create database '{new_dbname}': {e}")
 
 
-    def apply_create_table_ddls(self, table_ddl_map, existing_dbname, new_dbname, user, password, host='localhost', port=5432, drop_if_exists=False):
+    def apply_create_table_ddls(self, table_ddl_map, existing_dbname, new_dbname, user, password, host='localhost', port=5432, drop_if_exists=False, dependencies=None):
+        """
+        Create the tables of `table_ddl_map` in `new_dbname`. With DDL_APPLY_WORKERS > 1 (default 4) tables are
+        grouped by dependency_levels and each level is created concurrently on pooled connections, so the run
+        time follows the dependency depth rather than the table count. DDL_APPLY_WORKERS=1 keeps the serial path.
+        """
         method = "apply_create_table_ddls"
         self.create_database_if_not_exists(existing_dbname, new_dbname, user, password, host, port)
-        conn = psycopg2.connect(
-            dbname=new_dbname,
-            user=user,
-            password=password,
-            host=host,
-            port=port
+        pool = get_connection_pool(new_dbname, user, password, host, port)
+        workers = max(1, min(int(os.getenv("DDL_APPLY_WORKERS", 4)), pool.max_size))
+        started = time.perf_counter()
+
+        schema_names = sorted({table.split(".")[0] for table in table_ddl_map if "." in table})
+        if schema_names:
+            with pool.connection() as conn, conn.cursor() as cur:
+                for schema_name in schema_names:
+                    cur.execute(sql.SQL("CREATE SCHEMA IF NOT EXISTS {}").format(sql.Identifier(schema_name)))
+                conn.commit()
+
+        if workers == 1:
+            with pool.connection() as conn, conn.cursor() as cur:
+                for table, ddl in table_ddl_map.items():
+                    self._create_table(conn, cur, table, ddl, drop_if_exists)
+        else:
+            with pool.connection() as conn, conn.cursor() as cur:
+                # Shared objects first: concurrent CREATE EXTENSION IF NOT EXISTS can still collide.
+                if any('CREATE EXTENSION IF NOT EXISTS "uuid-ossp";' in ddl for ddl in table_ddl_map.values()):
+                    cur.execute('CREATE EXTENSION IF NOT EXISTS "uuid-ossp";')
+                if drop_if_exists and table_ddl_map:
+                    log(f"🔁 Dropping {len(table_ddl_map)} existing tables in '{new_dbname}'...")
+                    cur.execute(
+                        sql.SQL("DROP TABLE IF EXISTS {} CASCADE").format(
+                            sql.SQL(", ").join(_table_identifier(table) for table in table_ddl_map)
+                        )
+                    )
+                conn.commit()
+
+            dependencies = dependencies if dependencies is not None else {}
+            levels = self.dependency_levels({table: dependencies.get(table, {}) for table in table_ddl_map})
+
+            def create(table):
+                with pool.connection() as conn, conn.cursor() as cur:
+                    self._create_table(conn, cur, table, table_ddl_map[table], drop_if_exists)
+
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for level in levels:
+                    # Implicitly referenced tables that are not part of this map have nothing to create.
+                    list(executor.map(create, [table for table in level if table in table_ddl_map]))
+
+        log(
+            f"[{method}] Created {len(table_ddl_map)} tables in '{new_dbname}' with {workers} worker(s) "
+            f"in {time.perf_counter() - started:.2f}s"
         )
-        conn.set_session(autocommit=False)
 
-        with conn.cursor() as cur:
-            for table, ddl in table_ddl_map.items():
-                log(f"▶️ Creating table: {table}")
+
+    def _create_table(self, conn, cur, table, ddl, drop_if_exists):
+        log(f"▶️ Creating table: {table}")
+        try:
+            cur.execute(ddl)
+        except errors.DuplicateTable:
+            log(f"⚠️ Table '{table}' already exists.")
+            conn.rollback()
+            if drop_if_exists:
                 try:
+                    log(f"🔁 Dropping and recreating table '{table}'...")
+                    cur.execute(sql.SQL("DROP TABLE IF EXISTS {} CASCADE").format(_table_identifier(table)))
+                    conn.commit()
                     cur.execute(ddl)
-                except errors.DuplicateTable:
-                    log(f"⚠️ Table '{table}' already exists.")
-                    conn.rollback()
-                    if drop_if_exists:
-                        try:
-                            log(f"🔁 Dropping and recreating table '{table}'...")
-                            cur.execute(sql.SQL("DROP TABLE IF EXISTS {} CASCADE").format(sql.Identifier(table)))
-                            conn.commit()
-                            cur.execute(ddl)
-                            conn.commit()
-                            log(f"✅ Recreated table: {table}")
-                        except Exception as drop_err:
-                            log(f"❌ Error recreating '{table}': {drop_err}")
-                            conn.rollback()
-                    else:
-                        log(f"⏩ Skipping '{table}' (already exists)")
-                except Exception as e:
-                    log(f"❌ Error creating '{table}': {e}")
-                    conn.rollback()
-                else:
                     conn.commit()
-                    log(f"✅ Created table: {table}")
-        conn.close()
+                    log(f"✅ Recreated table: {table}")
+                except Exception as drop_err:
+                    log(f"❌ Error recreating '{table}': {drop_err}")
+                    conn.rollback()
+            else:
+                log(f"⏩ Skipping '{table}' (already exists)")
+        except Exception as e:
+            log(f"❌ Error creating '{table}': {e}")
+            conn.rollback()
+        else:
+            conn.commit()
+            log(f"✅ Created table: {table}")
 
 
     def clone_db(self):
-        ddls = self.get_schemas_from_db()
-        tables = self.gen_table_map(ddls)
-
-        new_dbname = os.getenv("DB_NAME") + "_test"
+        """
+        Create the <DB_NAME>_test database. CLONE_DB_STRATEGY picks the path: "template" copies the database
+        server-side with CREATE DATABASE ... TEMPLATE, "ddl" recreates every table from the introspected schema,
+        and "auto" (default) tries the template first and falls back to DDL. Returns which path was taken and
+        how long it took.
+        """
+        source_dbname = os.getenv("DB_NAME")
+        new_dbname = source_dbname + "_test"
         user = os.getenv("DB_USER")
         password = os.getenv("DB_PASSWORD")
         host = os.getenv("DB_HOST")
         port = os.getenv("DB_PORT")
 
-        self.apply_create_table_ddls(tables, os.getenv("DB_NAME"), new_dbname, user, password, host=host, port=port, drop_if_exists=True)
+        strategy = os.getenv("CLONE_DB_STRATEGY", "auto")
+        with_data = os.getenv("CLONE_DB_WITH_DATA", "false").lower() == "true"
+        started = time.perf_counter()
+        path = "ddl"
+
+        # A template copy is all-or-nothing, so sampled clones always take the DDL path.
+        if strategy in ("auto", "template") and not self.clone_sample_config():
+            if self.clone_db_from_template(source_dbname, new_dbname, user, password, host, port, keep_data=with_data):
+                path = "template"
+            else:
+                log(f"↩️ Falling back to DDL clone of '{source_dbname}'")
+
+        if path == "ddl":
+            ddls = self.get_schemas_from_db()
+            tables = self.gen_table_map(ddls)
+            self.apply_create_table_ddls(
+                tables, source_dbname, new_dbname, user, password, host=host, port=port, drop_if_exists=True,
+                dependencies=self.schema_dependencies(ddls),
+            )
+            if with_data:
+                self.copy_data_to_clone(ddls, source_dbname, new_dbname)
+            # Keys, indexes and FKs are built after the load: bulk-loading into bare tables is much cheaper.
+            if os.getenv("CLONE_DB_CONSTRAINTS", "true").lower() == "true":
+                self.apply_table_constraints(self.get_table_constraints(), new_dbname)
+
         os.environ["DB_NAME_TEST"] = new_dbname
+        self.last_clone_report = {
+            "strategy": path,
+            "database": new_dbname,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+        log(f"⏱️ Cloned '{source_dbname}' into '{new_dbname}' via {path} in {self.last_clone_report['seconds']}s")
+        return self.last_clone_report
+
+
+    def clone_db_from_template(self, source_dbname, new_dbname, user, password, host, port, keep_data=False) -> bool:
+        """
+        Clone with CREATE DATABASE ... TEMPLATE, a server-side file copy. Needs CREATEDB plus ownership of the
+        source (or superuser), and no other sessions connected to either database. Returns False, leaving
+        everything untouched, when any of that does not hold.
+        """
+        method = "clone_db_from_template"
+        # Our own idle pooled connections count as sessions on the template.
+        close_connection_pools(source_dbname)
+        close_connection_pools(new_dbname)
+        try:
+            with self._connection("postgres", user, password, host, port, autocommit=True) as conn, conn.cursor() as cur:
+                cur.execute("""
+                    SELECT r.rolsuper OR (r.rolcreatedb AND (d.datistemplate OR pg_has_role(d.datdba, 'MEMBER')))
+                    FROM pg_roles r, pg_database d
+                    WHERE r.rolname = current_user AND d.datname = %s
+                """, (source_dbname,))
+                row = cur.fetchone()
+                if not row or not row[0]:
+                    log(f"[{method}] Role '{user}' cannot use '{source_dbname}' as a template.")
+                    return False
+
+                cur.execute("""
+                    SELECT count(*) FROM pg_stat_activity
+                    WHERE datname IN (%s, %s) AND pid <> pg_backend_pid()
+                """, (source_dbname, new_dbname))
+                sessions = cur.fetchone()[0]
+                if sessions:
+                    log(f"[{method}] {sessions} other session(s) connected to '{source_dbname}' or '{new_dbname}'.")
+                    return False
+
+                cur.execute(sql.SQL("DROP DATABASE IF EXISTS {}").format(sql.Identifier(new_dbname)))
+                cur.execute(
+                    sql.SQL("CREATE DATABASE {} TEMPLATE {} OWNER {}").format(
+                        sql.Identifier(new_dbname), sql.Identifier(source_dbname), sql.Identifier(user)
+                    )
+                )
+        except Exception as e:
+            log(f"[{method}] ❌ Template clone failed: {e}")
+            return False
+
+        if not keep_data:
+            with self._connection(new_dbname, user, password, host, port) as conn, conn.cursor() as cur:
+                cur.execute("""
+                    SELECT string_agg(format('%I.%I', schemaname, tablename), ', ')
+                    FROM pg_tables
+                    WHERE schemaname NOT IN ('pg_catalog', 'information_schema')
+                """)
+                tables = cur.fetchone()[0]
+                if tables:
+                    cur.execute(f"TRUNCATE {tables} RESTART IDENTITY CASCADE")
+                conn.commit()
+        log(f"✅ Database '{new_dbname}' created from template '{source_dbname}'")
+        return True
+
+
+    def get_table_constraints(self) -> Dict[str, Dict[str, List]]:
+        """
+        Read primary keys, unique/check/exclusion constraints, foreign keys and the secondary indexes that do not
+        back a constraint from pg_catalog, as re-executable definitions:
+        {table: {"constraints": [{"name", "type", "definition"}], "indexes": [definition]}}.
+        """
+        schema_names = self.get_schema_names()
+        with self._connection() as conn, conn.cursor() as cur:
+            cur.execute("""
+            SELECT
+                CASE WHEN n.nspname = 'public' THEN cls.relname ELSE n.nspname || '.' || cls.relname END,
+                con.conname, con.contype, pg_get_constraintdef(con.oid)
+            FROM pg_constraint con
+            JOIN pg_class cls ON cls.oid = con.conrelid
+            JOIN pg_namespace n ON n.oid = cls.relnamespace
+            WHERE con.contype IN ('p', 'u', 'c', 'f', 'x')
+              AND con.conislocal
+              AND cls.relkind IN ('r', 'p')
+              AND n.nspname = ANY(%s)
+            ORDER BY 1, con.contype, con.conname
+            """, (schema_names,))
+            constraint_rows = cur.fetchall()
+
+            cur.execute("""
+            SELECT
+                CASE WHEN n.nspname = 'public' THEN cls.relname ELSE n.nspname || '.' || cls.relname END,
+                pg_get_indexdef(i.indexrelid)
+            FROM pg_index i
+            JOIN pg_class cls ON cls.oid = i.indrelid
+            JOIN pg_namespace n ON n.oid = cls.relnamespace
+            WHERE cls.relkind IN ('r', 'p')
+              AND n.nspname = ANY(%s)
+              AND NOT EXISTS (
+                  SELECT 1 FROM pg_constraint con
+                  WHERE con.conindid = i.indexrelid AND con.contype IN ('p', 'u', 'x')
+              )
+            ORDER BY 1
+            """, (schema_names,))
+            index_rows = cur.fetchall()
+
+        table_constraints = defaultdict(lambda: {"constraints": [], "indexes": []})
+        for table, name, contype, definition in constraint_rows:
+            table_constraints[table]["constraints"].append({"name": name, "type": contype, "definition": definition})
+        for table, definition in index_rows:
+            table_constraints[table]["indexes"].append(definition)
+        return dict(table_constraints)
+
+
+    def apply_table_constraints(self, table_constraints: Dict[str, Dict[str, List]], dbname: str):
+        """
+        Recreate constraints and indexes from get_table_constraints in `dbname`, in three phases: keys and checks,
+        then secondary indexes, then foreign keys (which need the referenced keys). Tables within a phase are
+        processed concurrently; FKs that deadlock against each other are retried serially.
+        """
+        method = "apply_table_constraints"
+        target_pool = get_connection_pool(
+            dbname, os.getenv("DB_USER"), os.getenv("DB_PASSWORD"), os.getenv("DB_HOST"), os.getenv("DB_PORT")
+        )
+        workers = max(1, min(int(os.getenv("CLONE_DB_WORKERS", 4)), target_pool.max_size))
+
+        def add_constraint(table, constraint):
+            return sql.SQL("ALTER TABLE {} ADD CONSTRAINT {} {}").format(
+                _table_identifier(table), sql.Identifier(constraint["name"]), sql.SQL(constraint["definition"])
+            )
+
+        phases = {
+            "keys and checks": {
+                table: [add_constraint(table, c) for c in info["constraints"] if c["type"] != "f"]
+                for table, info in table_constraints.items()
+            },
+            "indexes": {
+                table: [sql.SQL(definition) for definition in info["indexes"]]
+                for table, info in table_constraints.items()
+            },
+            "foreign keys": {
+                table: [add_constraint(table, c) for c in info["constraints"] if c["type"] == "f"]
+                for table, info in table_constraints.items()
+            },
+        }
+
+        started = time.perf_counter()
+        for phase, statements_by_table in phases.items():
+            statements_by_table = {table: stmts for table, stmts in statements_by_table.items() if stmts}
+            retry = []
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    executor.submit(self._execute_statements, dbname, table, statements)
+                    for table, statements in statements_by_table.items()
+                ]
+                for future in as_completed(futures):
+                    retry.extend(future.result())
+            for table, statement in retry:
+                self._execute_statements(dbname, table, [statement], retry_deadlocks=False)
+            log(f"🔑 Applied {phase} for {len(statements_by_table)} tables in '{dbname}'")
+
+        log(f"[{method}] ✅ Constraints and indexes built in {time.perf_counter() - started:.2f}s")
+
+
+    def _execute_statements(self, dbname, table, statements, retry_deadlocks=True):
+        """
+        Run statements one by one in autocommit mode so one failure does not undo the others. Returns the
+        statements that hit a deadlock, for the caller to retry.
+        """
+        deadlocked = []
+        with self._connection(dbname=dbname, autocommit=True) as conn, conn.cursor() as cur:
+            for statement in statements:
+                try:
+                    cur.execute(statement)
+                except errors.DeadlockDetected as e:
+                    if retry_deadlocks:
+                        deadlocked.append((table, statement))
+                    else:
+                        log(f"❌ Error on '{table}': {e}")
+                except Exception as e:
+                    log(f"❌ Error on '{table}': {e}")
+        return deadlocked
+
+
+    def schema_dependencies(self, schemas: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Build the {table: {column: {"links_to_table": parent, "foreign_column": ...}}} map used by topological_sort
+        from the merged output of get_schemas_from_db.
+        """
+        return {
+            table: {
+                column["column_name"]: {
+                    "links_to_table": column["links_to_table"],
+                    "foreign_column": column.get("foreign_key", {}).get("foreign_column"),
+                }
+                for column in columns
+                if column.get("links_to_table")
+            }
+            for table, columns in schemas.items()
+        }
+
+
+    def dependency_levels(self, dependencies: Dict[str, Any]) -> List[List[str]]:
+        """
+        Group tables so that every table comes after the tables it references. Tables inside one level do not
+        depend on each other and can be processed concurrently. Unlike topological_sort this never raises:
+        reference cycles (strongly connected components, including self references) are collapsed into a single
+        node and all of their tables land in the same level, relying on FKs being added after the tables exist.
+        """
+        parents = defaultdict(set)
+        tables = set(dependencies)
+        for child, columns in dependencies.items():
+            for info in columns.values():
+                parents[child].add(info["links_to_table"])
+                tables.add(info["links_to_table"])
+
+        # Iterative Tarjan over child -> parent edges, so long FK chains cannot hit the recursion limit.
+        # A component is emitted only after every component it references, i.e. in dependency order.
+        index, lowlink, component = {}, {}, {}
+        stack, on_stack, emitted = [], set(), []
+        for root in sorted(tables):
+            if root in index:
+                continue
+            index[root] = lowlink[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(sorted(parents[root])))]
+            while work:
+                node, node_parents = work[-1]
+                for parent in node_parents:
+                    if parent not in index:
+                        index[parent] = lowlink[parent] = len(index)
+                        stack.append(parent)
+                        on_stack.add(parent)
+                        work.append((parent, iter(sorted(parents[parent]))))
+                        break
+                    if parent in on_stack:
+                        lowlink[node] = min(lowlink[node], index[parent])
+                else:
+                    work.pop()
+                    if work:
+                        caller = work[-1][0]
+                        lowlink[caller] = min(lowlink[caller], lowlink[node])
+                    if lowlink[node] == index[node]:
+                        members = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component[member] = node
+                            members.append(member)
+                            if member == node:
+                                break
+                        emitted.append(members)
+
+        level_of = {}
+        levels = defaultdict(list)
+        for members in emitted:
+            root = component[members[0]]
+            level_of[root] = 1 + max(
+                (
+                    level_of[component[parent]]
+                    for table in members
+                    for parent in parents[table]
+                    if component[parent] != root
+                ),
+                default=-1,
+            )
+            levels[level_of[root]].extend(members)
+        return [sorted(levels[level]) for level in sorted(levels)]
+
+
+    def clone_sample_config(self) -> Dict[str, Any]:
+        """
+        Per-table sampling from CLONE_DB_SAMPLE, e.g. '{"*": 10000, "events": "1%"}'. An integer keeps at most that
+        many rows, a percentage samples table blocks, and tables without an entry (and no "*") are copied in full.
+        """
+        raw = os.getenv("CLONE_DB_SAMPLE")
+        if not raw:
+            return {}
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"CLONE_DB_SAMPLE is not valid JSON: {e}")
+
+
+    def copy_data_to_clone(self, schemas: Dict[str, Any], source_dbname: str, target_dbname: str):
+        """
+        Stream table data from the source database into the clone with COPY, level by level in dependency
+        order. Rows of sampled tables, and of tables referencing sampled ones, are filtered so every foreign key
+        still points at a copied row. All workers read from one exported snapshot; with a single-connection pool
+        the tables are copied one by one on the snapshot connection itself.
+        """
+        method = "copy_data_to_clone"
+        dependencies = self.schema_dependencies(schemas)
+        samples = self.clone_sample_config()
+        source_pool = get_connection_pool(
+            source_dbname, os.getenv("DB_USER"), os.getenv("DB_PASSWORD"), os.getenv("DB_HOST"), os.getenv("DB_PORT")
+        )
+        # One source connection holds the exported snapshot, the others run copies.
+        workers = max(0, min(int(os.getenv("CLONE_DB_WORKERS", 4)), source_pool.max_size - 1))
+
+        filtered = set()
+        started = time.perf_counter()
+        with source_pool.connection() as snapshot_conn:
+            with snapshot_conn.cursor() as cur:
+                cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+                cur.execute("SELECT pg_export_snapshot()")
+                snapshot_id = cur.fetchone()[0]
+
+            for level in self.dependency_levels(dependencies):
+                jobs = {}
+                for table in level:
+                    if table not in schemas:
+                        continue  # referenced parent outside DB_SCHEMAS or not readable; it was not cloned
+                    sample = samples.get(table, samples.get("*"))
+                    parents = {
+                        col: info for col, info in dependencies.get(table, {}).items()
+                        if info["links_to_table"] in filtered
+                        or (info["links_to_table"] == table and sample is not None)
+                    }
+                    if sample is not None or parents:
+                        filtered.add(table)
+                    jobs[table] = (sample, parents)
+
+                if workers == 0:
+                    for table, (sample, parents) in jobs.items():
+                        # A failed COPY would abort the snapshot transaction for every table after it.
+                        with snapshot_conn.cursor() as cur:
+                            cur.execute("SAVEPOINT revolve_copy")
+                        try:
+                            rows = self._copy_table_from(snapshot_conn, table, schemas[table], sample, parents, target_dbname)
+                            log(f"📥 Copied {rows} rows into '{table}'")
+                        except Exception as e:
+                            with snapshot_conn.cursor() as cur:
+                                cur.execute("ROLLBACK TO SAVEPOINT revolve_copy")
+                            log(f"[{method}] ❌ Failed to copy data for '{table}': {e}")
+                    continue
+
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    futures = {
+                        executor.submit(
+                            self._copy_table, table, schemas[table], sample, parents, snapshot_id,
+                            source_dbname, target_dbname,
+                        ): table
+                        for table, (sample, parents) in jobs.items()
+                    }
+                    for future in as_completed(futures):
+                        table = futures[future]
+                        try:
+                            rows = future.result()
+                            log(f"📥 Copied {rows} rows into '{table}'")
+                        except Exception as e:
+                            log(f"[{method}] ❌ Failed to copy data for '{table}': {e}")
+
+        log(f"✅ Copied data for {len(schemas)} tables in {time.perf_counter() - started:.2f}s")
+
+
+    def _copy_table(self, table, columns, sample, parents, snapshot_id, source_dbname, target_dbname):
+        with self._connection(dbname=source_dbname) as src_conn:
+            with src_conn.cursor() as cur:
+                cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+                cur.execute("SET TRANSACTION SNAPSHOT %s", (snapshot_id,))
+            return self._copy_table_from(src_conn, table, columns, sample, parents, target_dbname)
+
+
+    def _copy_table_from(self, src_conn, table, columns, sample, parents, target_dbname):
+        """Copy one table from `src_conn`, which already reads the clone snapshot, into `target_dbname`."""
+        table_id = _table_identifier(table)
+        column_ids = sql.SQL(", ").join(sql.Identifier(c["column_name"]) for c in columns)
+
+        select = sql.SQL("SELECT {} FROM {}").format(column_ids, table_id)
+        if isinstance(sample, str) and sample.endswith("%"):
+            select = sql.SQL("SELECT {} FROM {} TABLESAMPLE SYSTEM ({})").format(
+                column_ids, table_id, sql.Literal(float(sample.rstrip("%")))
+            )
+        elif sample is not None:
+            select = sql.SQL("{} LIMIT {}").format(select, sql.Literal(int(sample)))
+
+        with self._connection(dbname=target_dbname) as dst_conn:
+            # Text format: the clone recreates some columns with a different type (e.g. ARRAY columns as text[]),
+            # which binary COPY rejects; text COPY goes through the target type's input function.
+            copy_out = sql.SQL("COPY ({}) TO STDOUT WITH (FORMAT text)").format(select).as_string(src_conn)
+
+            with dst_conn.cursor() as cur:
+                if not parents:
+                    copy_in = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT text)").format(table_id, column_ids)
+                    rows = self._stream_copy(src_conn, dst_conn, copy_out, copy_in.as_string(dst_conn))
+                else:
+                    cur.execute(
+                        sql.SQL("CREATE TEMP TABLE revolve_copy_stage ON COMMIT DROP AS SELECT {} FROM {} WITH NO DATA")
+                        .format(column_ids, table_id)
+                    )
+                    copy_in = sql.SQL("COPY revolve_copy_stage ({}) FROM STDIN WITH (FORMAT text)").format(column_ids)
+                    self._stream_copy(src_conn, dst_conn, copy_out, copy_in.as_string(dst_conn))
+
+                    # Keep only rows whose references were copied; self references are resolved afterwards.
+                    conditions = [
+                        sql.SQL("(s.{col} IS NULL OR EXISTS (SELECT 1 FROM {parent} p WHERE p.{pcol} = s.{col}))").format(
+                            col=sql.Identifier(col),
+                            parent=_table_identifier(info["links_to_table"]),
+                            pcol=sql.Identifier(info["foreign_column"]),
+                        )
+                        for col, info in parents.items()
+                        if info["links_to_table"] != table
+                    ] or [sql.SQL("true")]
+                    cur.execute(
+                        sql.SQL("INSERT INTO {} ({}) SELECT {} FROM revolve_copy_stage s WHERE {}").format(
+                            table_id, column_ids, column_ids, sql.SQL(" AND ").join(conditions)
+                        )
+                    )
+                    rows = cur.rowcount
+
+                    for col, info in parents.items():
+                        nullable = any(c["column_name"] == col and c["is_nullable"] == "YES" for c in columns)
+                        if info["links_to_table"] == table and nullable:
+                            cur.execute(
+                                sql.SQL(
+                                    "UPDATE {t} SET {col} = NULL WHERE {col} IS NOT NULL "
+                                    "AND NOT EXISTS (SELECT 1 FROM {t} p WHERE p.{pcol} = {t}.{col})"
+                                ).format(t=table_id, col=sql.Identifier(col), pcol=sql.Identifier(info["foreign_column"]))
+                            )
+
+                # Move serial sequences past the copied ids.
+                for column in columns:
+                    if column.get("data_type_s") in ("serial", "bigserial"):
+                        cur.execute(
+                            sql.SQL(
+                                "SELECT setval(pg_get_serial_sequence(%s, %s), COALESCE(MAX({col}), 0) + 1, false) FROM {t}"
+                            ).format(col=sql.Identifier(column["column_name"]), t=table_id),
+                            (table, column["column_name"]),
+                        )
+            dst_conn.commit()
+        return rows
+
+
+    @staticmethod
+    def _stream_copy(src_conn, dst_conn, copy_out_sql, copy_in_sql):
+        """
+        Pipe COPY ... TO STDOUT on one connection into COPY ... FROM STDIN on another through an OS pipe, so
+        only a pipe buffer's worth of data is ever held in memory.
+        """
+        read_fd, write_fd = os.pipe()
+        producer_errors = []
+
+        def produce():
+            try:
+                with os.fdopen(write_fd, "wb") as writer, src_conn.cursor() as cur:
+                    cur.copy_expert(copy_out_sql, writer)
+            except Exception as e:
+                producer_errors.append(e)
+
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+        try:
+            with os.fdopen(read_fd, "rb") as reader, dst_conn.cursor() as cur:
+                cur.copy_expert(copy_in_sql, reader)
+                rows = cur.rowcount
+        finally:
+            producer.join()
+        if producer_errors:
+            raise producer_errors[0]
+        return rows
 
 
     def extract_permissions(self, result_data):
@@ -671,7 +1654,36 @@ class PostgresAdapter(DatabaseAdapter):
             }
 
 
+_DECLARABLE_QUERY = re.compile(r"^\s*(?:\(\s*)*(?:SELECT|WITH|VALUES|TABLE)\b", re.IGNORECASE)
+
+
+def _single_statement(query: str) -> str:
+    """The query without its trailing semicolon; raises ValueError unless it is exactly one SQL statement."""
+    statements = [sqlparse.format(statement, strip_comments=True).strip() for statement in sqlparse.split(query)]
+    statements = [statement.rstrip(";").rstrip() for statement in statements if statement.rstrip(";").strip()]
+    if len(statements) != 1:
+        raise ValueError(f"Expected a single SQL statement, got {len(statements)}")
+    return statements[0]
+
+
+@contextmanager
+def _read_only_session(conn):
+    """Make every transaction on this pooled connection read-only until the block exits."""
+    conn.set_session(readonly=True)
+    try:
+        yield conn
+    finally:
+        if not conn.closed:
+            conn.rollback()
+            conn.set_session(readonly="default")
+
+
+def _table_identifier(table_name: str) -> sql.Composable:
+    """Quote a possibly schema-qualified table name ("schema.table") as an identifier."""
+    return sql.Identifier(*table_name.split("."))
+
+
 def default_serializer(obj):
     if isinstance(obj, (datetime.date, datetime.datetime)):
         return obj.isoformat()
-    return obj
\ No newline at end of file
+    return str(obj)
\ No newline at end of file
@@ -0,0 +1,93 @@
+import copy
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Callable, Dict
+
+from revolve.utils import log
+
+
+class SchemaCache:
+    """
+    Process-wide cache of introspected schemas shared by all adapter instances.
+    An entry is only reused while the database's catalog fingerprint is unchanged. Set SCHEMA_CACHE_DIR to also
+    persist entries on disk so a restarted server starts warm.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple, fingerprint: Any, load: Callable[[], Dict]) -> Dict:
+        """
+        Return the schemas cached for `key` if they were stored under `fingerprint`, otherwise call `load()`
+        and cache its result.
+        """
+        cache_key = hashlib.sha256(json.dumps(key, default=str).encode("utf-8")).hexdigest()
+        # Normalise so a fingerprint read back from disk compares equal to a freshly computed one.
+        fingerprint = json.loads(json.dumps(fingerprint, default=str))
+
+        with self._lock:
+            entry = self._entries.get(cache_key)
+        if entry is None:
+            entry = self._read(cache_key)
+
+        if entry is not None and entry["fingerprint"] == fingerprint:
+            with self._lock:
+                self.hits += 1
+                self._entries[cache_key] = entry
+            log(f"Schema cache hit ({self.hits} hits / {self.misses} misses)", level="DEBUG")
+            return copy.deepcopy(entry["schemas"])
+
+        schemas = load()
+        entry = {"fingerprint": fingerprint, "schemas": copy.deepcopy(schemas)}
+        with self._lock:
+            self.misses += 1
+            self._entries[cache_key] = entry
+        self._write(cache_key, entry)
+        log(f"Schema cache miss ({self.hits} hits / {self.misses} misses)", level="DEBUG")
+        return schemas
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+    def _path(self, cache_key: str):
+        persist_dir = os.getenv("SCHEMA_CACHE_DIR")
+        if not persist_dir:
+            return None
+        return os.path.join(persist_dir, f"{cache_key}.json")
+
+    def _read(self, cache_key: str):
+        path = self._path(cache_key)
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except Exception as e:
+            log(f"Ignoring unreadable schema cache file {path}: {e}")
+            return None
+
+    def _write(self, cache_key: str, entry: Dict[str, Any]):
+        path = self._path(cache_key)
+        if not path:
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(entry, f, default=str)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            log(f"Error writing schema cache file {path}: {e}")
+
+
+schema_cache = SchemaCache()
@@ -0,0 +1,176 @@
+import re
+from typing import BinaryIO, Iterator, Optional
+
+# Tokens that change the lexer state outside of quotes and comments.
+_NORMAL_TOKENS = re.compile(r"--|/\*|(?<![A-Za-z0-9_])[Ee]'|'|\"|\$(?:[A-Za-z_][A-Za-z_0-9]*)?\$|;")
+_BLOCK_COMMENT_TOKENS = re.compile(r"/\*|\*/")
+_ESCAPE_STRING_TOKENS = re.compile(r"\\.|'", re.DOTALL)
+_COPY_FROM_STDIN = re.compile(r"^(?:\s*/\*.*?\*/)*\s*COPY\b.*\bFROM\s+STDIN\b", re.IGNORECASE | re.DOTALL)
+
+COPY_TERMINATOR = b"\\.\n"
+
+
+class SqlStatement:
+    """A complete SQL statement. For COPY ... FROM stdin, `copy_data` streams the data block that follows it."""
+
+    def __init__(self, text: str, copy_data: Optional["CopyDataReader"] = None):
+        self.text = text
+        self.copy_data = copy_data
+
+
+class CopyDataReader:
+    """
+    File-like view over the data block of a COPY ... FROM stdin statement, ending at the "\\." line.
+    Passed straight to cursor.copy_expert, so the block is streamed instead of read into memory.
+    """
+
+    def __init__(self, reader: "SqlStatementReader"):
+        self._reader = reader
+        self._buffer = b""
+        self.finished = False
+
+    def readline(self, size=-1) -> bytes:
+        if self._buffer:
+            line, self._buffer = self._buffer, b""
+            return line
+        if self.finished:
+            return b""
+        line = self._reader._readline()
+        if not line or line in (COPY_TERMINATOR, b"\\.\r\n", b"\\."):
+            self.finished = True
+            return b""
+        return line
+
+    def read(self, size=-1) -> bytes:
+        chunks, total = [], 0
+        while size < 0 or total < size:
+            line = self.readline()
+            if not line:
+                break
+            chunks.append(line)
+            total += len(line)
+        data = b"".join(chunks)
+        if 0 <= size < len(data):
+            data, self._buffer = data[:size], data[size:]
+        return data
+
+    def drain(self):
+        while self.readline():
+            pass
+
+
+class SqlStatementReader:
+    """
+    Incrementally split a SQL dump read from a binary file handle into statements. Handles quoted strings and
+    identifiers, E'' escapes, dollar quoting, line and nested block comments, psql meta-commands (skipped) and
+    COPY ... FROM stdin data blocks. Memory use is bounded by the largest single statement, not the dump size.
+    """
+
+    def __init__(self, f: BinaryIO, encoding="utf-8"):
+        self._f = f
+        self.encoding = encoding
+        self.bytes_read = 0
+        self.statements_read = 0
+
+    def _readline(self) -> bytes:
+        line = self._f.readline()
+        self.bytes_read += len(line)
+        return line
+
+    def __iter__(self) -> Iterator[SqlStatement]:
+        parts = []
+        has_content = False
+        state = None  # None, "'", "E'", '"', "/*", or a dollar-quote tag
+        comment_depth = 0
+        pending = ""
+
+        while True:
+            if pending:
+                line, pending = pending, ""
+            else:
+                raw = self._readline()
+                if not raw:
+                    break
+                line = raw.decode(self.encoding)
+
+            # psql meta-commands (\connect, \restrict, ...) only appear at the start of a statement.
+            if state is None and not has_content and line.startswith("\\"):
+                parts = []
+                continue
+
+            pos = 0
+            while pos < len(line):
+                if state is None:
+                    match = _NORMAL_TOKENS.search(line, pos)
+                    if not match:
+                        has_content = has_content or bool(line[pos:].strip())
+                        pos = len(line)
+                        break
+                    has_content = has_content or bool(line[pos:match.start()].strip())
+                    token = match.group()
+                    pos = match.end()
+                    if token == "--":
+                        # Line comments are dropped so they never end up in front of a COPY statement.
+                        line = line[:match.start()] + "\n"
+                        pos = len(line)
+                    elif token == "/*":
+                        state, comment_depth = "/*", 1
+                    elif token == ";":
+                        text = "".join(parts) + line[:pos]
+                        pending = line[pos:] if line[pos:].strip() else ""
+                        parts, line = [], ""
+                        if has_content:
+                            yield from self._emit(text.strip())
+                        has_content = False
+                        break
+                    else:
+                        has_content = True
+                        state = "E'" if token in ("E'", "e'") else token
+                elif state == "/*":
+                    match = _BLOCK_COMMENT_TOKENS.search(line, pos)
+                    if not match:
+                        pos = len(line)
+                        break
+                    comment_depth += 1 if match.group() == "/*" else -1
+                    pos = match.end()
+                    if comment_depth == 0:
+                        state = None
+                elif state == "E'":
+                    match = _ESCAPE_STRING_TOKENS.search(line, pos)
+                    if not match:
+                        pos = len(line)
+                        break
+                    pos = match.end()
+                    if match.group() == "'":
+                        if line.startswith("'", pos):
+                            pos += 1
+                        else:
+                            state = None
+                else:
+                    # Plain strings, quoted identifiers and dollar quotes all end at their opening token;
+                    # a doubled quote is an escaped quote and keeps the state.
+                    end = line.find(state, pos)
+                    if end < 0:
+                        pos = len(line)
+                        break
+                    pos = end + len(state)
+                    if state in ("'", '"') and line.startswith(state, pos):
+                        pos += 1
+                    else:
+                        state = None
+            if line:
+                parts.append(line)
+
+        text = "".join(parts).strip()
+        if has_content and text:
+            yield from self._emit(text)
+
+    def _emit(self, text: str) -> Iterator[SqlStatement]:
+        self.statements_read += 1
+        if _COPY_FROM_STDIN.match(text):
+            copy_data = CopyDataReader(self)
+            yield SqlStatement(text, copy_data)
+            # Skip whatever the consumer did not read, e.g. when the COPY failed.
+            copy_data.drain()
+        else:
+            yield SqlStatement(text)
@@ -1,55 +1,426 @@
+import atexit
+import functools
+import hashlib
+import inspect
+import json
 import os
+import threading
+import time
 
+import httpx
 from pydantic_core import ValidationError
 from revolve.data_types import *
+from langchain_core.messages import AIMessage
+from langchain_core.utils.function_calling import convert_to_openai_tool
 from langchain_openai import ChatOpenAI
+from pydantic import BaseModel
+from revolve.llm_backend import get_llm_backend
+from revolve.llm_cache import LLMResponseCache, get_llm_cache
+from revolve.llm_hedge import LLMCallCancelled, LLMDeadlineExceeded, hedged_call
+from revolve.llm_rate_limit import RETRYABLE_ERRORS, estimate_tokens, get_rate_limiter
+from revolve.llm_usage import get_usage_tracker, usage_from_response
+from revolve.utils import log
 
-def invoke_llm(messages, max_attempts=3, validation_class=None, method="function_calling", logger=None, manual_validation=False):
-    llm  = ChatOpenAI(model=os.getenv("OPENAI_MODEL", "gpt-4.1"), temperature=0.2, max_tokens=16000)
-   
-    if validation_class:
-        llm = llm.with_structured_output(validation_class, method=method)
+# Chat models are cached per (model, endpoint, sampling params, api key, structured output) and share one
+# keep-alive HTTP connection pool, so repeated calls skip client construction and TLS handshakes.
+_models = {}
+_models_lock = threading.RLock()
+_http_client = None
 
 
-    for i in range(max_attempts):
+def _shared_http_client() -> httpx.Client:
+    # LLM calls are synchronous (nodes fan out over thread pools), so there is no async client to share.
+    global _http_client
+    with _models_lock:
+        if _http_client is None:
+            limits = httpx.Limits(
+                max_connections=int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", 20)),
+                max_keepalive_connections=int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", 20)),
+                keepalive_expiry=float(os.getenv("LLM_HTTP_KEEPALIVE_SECONDS", 60)),
+            )
+            timeout = httpx.Timeout(600.0, connect=10.0)
+            _http_client = httpx.Client(limits=limits, timeout=timeout)
+        return _http_client
+
+
+def chat_model_settings(model=None, temperature=0.2, max_tokens=16000, base_url=None) -> dict:
+    """The effective settings get_chat_model uses; unset values fall back to the OPENAI_* env vars."""
+    return {
+        "model": model or os.getenv("OPENAI_MODEL", "gpt-4.1"),
+        "base_url": base_url or os.getenv("OPENAI_BASE_URL") or os.getenv("OPENAI_API_BASE"),
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+    }
+
+
+def _model_routes() -> dict:
+    """
+    Routing table from node (or purpose) to model settings: model, base_url, temperature, max_tokens, api_key_env
+    (name of the env var holding the key) and escalate_to (route used after a failed validation). A string value
+    aliases another route, and unset settings fall back to get_chat_model's defaults. Nodes without a route use
+    "default". LLM_MODEL_ROUTES (JSON) adds or replaces routes, e.g. to point one at a local OpenAI-compatible server.
+    """
+    routes = {
+        "default": {},
+        "fast": {"model": os.getenv("OPENAI_FAST_MODEL", "gpt-4.1-mini"), "escalate_to": "default"},
+        "check_user_request": "fast",
+        "generate_prompt_for_code_generation": "fast",
+        "tool_handler": {"model": "gpt-4o", "max_tokens": None},
+    }
+    routes.update(_route_overrides(os.getenv("LLM_MODEL_ROUTES") or "{}"))
+    return routes
+
+
+@functools.lru_cache(maxsize=8)
+def _route_overrides(raw: str) -> dict:
+    """Parsed LLM_MODEL_ROUTES. A malformed value, or entry, is logged once and ignored rather than failing calls."""
+    try:
+        overrides = json.loads(raw)
+    except ValueError as e:
+        log(f"Ignoring LLM_MODEL_ROUTES, it is not valid JSON: {e}")
+        return {}
+    if not isinstance(overrides, dict):
+        log("Ignoring LLM_MODEL_ROUTES, it must be a JSON object mapping route names to routes")
+        return {}
+    valid = {}
+    for name, route in overrides.items():
+        if isinstance(route, (str, dict)):
+            valid[name] = route
+        else:
+            log(f"Ignoring LLM_MODEL_ROUTES entry '{name}': a route is an object of settings or an alias name")
+    return valid
+
+
+def resolve_model_route(name: str):
+    """(route name, route) for a node or route name, following aliases; unknown names resolve to "default"."""
+    routes = _model_routes()
+    seen = set()
+    while isinstance(routes.get(name), str) and name not in seen:
+        seen.add(name)
+        name = routes[name]
+    if not isinstance(routes.get(name), dict):
+        name = "default"
+    return name, routes.get(name, {})
+
+
+def route_model_settings(route: dict) -> dict:
+    """get_chat_model keyword arguments for a route."""
+    settings = {key: route[key] for key in ("model", "base_url", "temperature", "max_tokens") if key in route}
+    if route.get("api_key_env"):
+        settings["api_key"] = os.getenv(route["api_key_env"])
+    return settings
+
+
+def get_chat_model(model=None, temperature=0.2, max_tokens=16000, base_url=None, api_key=None) -> ChatOpenAI:
+    """Return the shared ChatOpenAI client for these settings; unset values fall back to the OPENAI_* env vars."""
+    settings = chat_model_settings(model, temperature, max_tokens, base_url)
+    model, base_url = settings["model"], settings["base_url"]
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    api_key_hash = hashlib.sha256(api_key.encode("utf-8")).hexdigest() if api_key else None
+    key = ("chat", model, base_url, temperature, max_tokens, api_key_hash)
+
+    with _models_lock:
+        if key not in _models:
+            http_client = _shared_http_client()
+            kwargs = {"base_url": base_url, "api_key": api_key, "max_tokens": max_tokens}
+            _models[key] = ChatOpenAI(
+                model=model,
+                temperature=temperature,
+                max_retries=0,  # retries and backoff are handled by invoke_rate_limited
+                stream_usage=True,
+                http_client=http_client,
+                **{name: value for name, value in kwargs.items() if value is not None},
+            )
+        return _models[key]
+
+
+def get_llm(validation_class=None, method="function_calling", **model_settings):
+    """
+    get_chat_model, optionally wrapped with structured output for `validation_class`; cached the same way.
+    Structured output keeps the raw message ({"raw", "parsed", "parsing_error"}) for its token usage.
+    """
+    llm = get_chat_model(**model_settings)
+    if not validation_class:
+        return llm
+
+    key = ("structured", id(llm), validation_class, method)
+    with _models_lock:
+        if key not in _models:
+            _models[key] = llm.with_structured_output(validation_class, method=method, include_raw=True)
+        return _models[key]
+
+
+class StreamingStructuredOutput:
+    """
+    Structured output that streams the tool-call arguments and reports progress through `send` while they arrive,
+    so long generations (whole files) show a first token and a running count instead of a silent wait. Progress
+    events are sent on the first chunk and then at most every LLM_PROGRESS_INTERVAL seconds, with the `table` they
+    belong to and the number of streamed `chunks` (usage metadata only arrives with the final chunk).
+    Returns the same {"raw", "parsed", "parsing_error"} shape as get_llm.
+    """
+
+    def __init__(self, validation_class, send, node, label=None, model_settings=None, cancel=None):
+        self.validation_class = validation_class
+        self.cancel = cancel
+        self.tool_name = convert_to_openai_tool(validation_class)["function"]["name"]
+        self.send = send
+        self.node = node
+        self.table = label
+        self.label = label or self.tool_name
+        self.interval = float(os.getenv("LLM_PROGRESS_INTERVAL", 2))
+        llm = get_chat_model(**(model_settings or {}))
+        key = ("streaming", id(llm), validation_class)
+        with _models_lock:
+            if key not in _models:
+                _models[key] = llm.bind_tools([validation_class], tool_choice=self.tool_name)
+            self.llm = _models[key]
+
+    def invoke(self, messages):
+        started = time.monotonic()
+        last_sent = None
+        message, chunks = None, 0
+        stream = self.llm.stream(messages)
+        for chunk in stream:
+            if self.cancel is not None and self.cancel.is_set():
+                stream.close()  # closes the HTTP response, so the server stops generating
+                raise LLMCallCancelled(f"Stopped streaming {self.label}")
+            message = chunk if message is None else message + chunk
+            chunks += 1
+            now = time.monotonic()
+            if last_sent is None:
+                self._progress(f"Generating {self.label}: first token after {now - started:.1f}s", chunks)
+                last_sent = now
+            elif now - last_sent >= self.interval:
+                self._progress(f"Generating {self.label}: {chunks} chunks in {now - started:.0f}s", chunks)
+                last_sent = now
+
+        if message is None:
+            return {"raw": None, "parsed": None, "parsing_error": None}
+        output_tokens = (message.usage_metadata or {}).get("output_tokens")
+        streamed = f"{output_tokens} tokens" if output_tokens else f"{chunks} chunks"
+        log(f"Streamed {self.label}: {streamed} in {time.monotonic() - started:.1f}s")
+        tool_calls = [call for call in message.tool_calls if call["name"] == self.tool_name]
+        parsed = None  # truncated or unparsable arguments; invoke_llm treats it as a failed attempt
+        if tool_calls:
+            args = tool_calls[0]["args"]
+            is_model = isinstance(self.validation_class, type) and issubclass(self.validation_class, BaseModel)
+            parsed = self.validation_class(**args) if is_model else args
+        return {"raw": message, "parsed": parsed, "parsing_error": None}
+
+    def _progress(self, text, chunks):
         try:
-            response = llm.invoke(messages)
-            if manual_validation and isinstance(response, validation_class):
-                return response
-            elif response and (not validation_class or validation_class(**response)):
+            self.send({
+                "name": self.node,
+                "text": text,
+                "status": "processing",
+                "level": "system",
+                "table": self.table,
+                "chunks": chunks,
+            })
+        except Exception as e:
+            print(f"Error sending progress for {self.label}: {e}")
+
+
+def close_llm_clients():
+    global _http_client
+    with _models_lock:
+        _models.clear()
+        if _http_client is not None:
+            _http_client.close()
+            _http_client = None
+
+
+atexit.register(close_llm_clients)
+
+
+def _charge_usage(limiter, estimated_tokens, response, stats):
+    """Record the response's token usage in `stats` and charge what the estimate missed to the TPM bucket."""
+    usage = usage_from_response(response)
+    stats.update(usage)
+    limiter.charge(usage["completion_tokens"] + max(0, usage["prompt_tokens"] - estimated_tokens))
+
+
+def invoke_rate_limited(runnable, messages, stats=None, cancel=None):
+    """
+    Invoke `runnable` within the shared concurrency and RPM/TPM limits. Rate limits, server errors and dropped
+    connections are retried up to LLM_MAX_RETRIES times with backoff, honoring Retry-After. Queue wait, retries
+    and token usage are added to `stats` when given. A `cancel` token (see hedged_call) is told when the request
+    is sent; once set, requests not yet sent are skipped. A request already sent keeps its slot until it returns,
+    so abandoned requests still count against LLM_MAX_CONCURRENCY.
+    """
+    limiter = get_rate_limiter()
+    estimated_tokens = estimate_tokens(messages)
+    max_retries = int(os.getenv("LLM_MAX_RETRIES", 6))
+    stats = {} if stats is None else stats
+    stats.setdefault("queue_seconds", 0.0)
+    stats.setdefault("retries", 0)
+
+    for attempt in range(max_retries + 1):
+        with limiter.slot(estimated_tokens) as waited:
+            stats["queue_seconds"] += waited
+            if cancel is not None:
+                if cancel.is_set():
+                    raise LLMCallCancelled("Cancelled while queued")
+                cancel.sent()
+            try:
+                response = runnable.invoke(messages)
+                _charge_usage(limiter, estimated_tokens, response, stats)
                 return response
+            except RETRYABLE_ERRORS as e:
+                if attempt == max_retries:
+                    raise
+                stats["retries"] += 1
+                error, delay = e, limiter.backoff(attempt, e)
+        log(f"{type(error).__name__}, retrying in {delay:.1f}s ({attempt + 1}/{max_retries})")
+        time.sleep(delay)
+
+
+def _effective_settings(model_settings=None) -> dict:
+    """chat_model_settings for get_chat_model keyword arguments; the api key never leaves get_chat_model."""
+    return chat_model_settings(**{key: value for key, value in (model_settings or {}).items() if key != "api_key"})
+
+
+def _request_key(messages, validation_class=None, method="function_calling", tools=None, model_settings=None):
+    """Hash identifying a request; shared by the response cache and the record/replay backend."""
+    return LLMResponseCache.key(_effective_settings(model_settings), validation_class, method, messages, tools=tools)
+
+
+def _parsed(result):
+    """Unwrap an include_raw structured-output result, re-raising parsing errors so invoke_llm can retry."""
+    if result["parsing_error"]:
+        raise result["parsing_error"]
+    return result["parsed"]
+
+
+def _track(node, table, source, model_settings=None, started=None, stats=None, error=None, hedge=False):
+    usage = dict(stats or {}, hedge=hedge)
+    if started is not None:
+        usage["wall_seconds"] = time.monotonic() - started
+    if error is not None:
+        usage["error"] = f"{type(error).__name__}: {error}"
+    get_usage_tracker().record(node, table, model=_effective_settings(model_settings)["model"], source=source, **usage)
+
+
+def _tracked_call(node, table, invoke, model_settings=None, hedge=False):
+    """Run `invoke(stats)` and record its wall time, queue wait, retries and tokens, failed or not."""
+    stats, started = {}, time.monotonic()
+    try:
+        response = invoke(stats)
+    except Exception as e:
+        _track(node, table, "api", model_settings, started, stats, error=e, hedge=hedge)
+        raise
+    _track(node, table, "api", model_settings, started, stats, hedge=hedge)
+    return response
+
+
+def _cached_response(cache, cache_key, validation_class, node):
+    hit, response = cache.get(cache_key, validation_class, node=node)
+    if hit:
+        stats = cache.stats()[node]
+        log(f"LLM cache hit for {node} ({stats['hits']} hits / {stats['misses']} misses)")
+    return hit, response
+
+
+def _is_valid(response, validation_class, manual_validation):
+    if manual_validation and isinstance(response, validation_class):
+        return True
+    return bool(response) and (not validation_class or bool(validation_class(**response)))
+
+
+def _escalate(node, route_name, route):
+    """The route to use after a failed attempt: the route's escalate_to, if any, otherwise the same one."""
+    if not route.get("escalate_to"):
+        return route_name, route
+    next_name, next_route = resolve_model_route(route["escalate_to"])
+    log(f"Escalating {node} from the {route_name} model route to {next_name} after a failed attempt")
+    return next_name, next_route
+
+
+def invoke_llm(messages, max_attempts=3, validation_class=None, method="function_calling", logger=None, manual_validation=False, node=None, send=None, table=None):
+    """
+    Invoke the model routed for `node` (see _model_routes) with caching, shared rate limits and validation retries;
+    a failed attempt moves to the route's escalate_to model. Slow API calls are hedged and bounded by a deadline
+    (see hedged_call). Every call is recorded in the usage tracker under `node` and `table`. With `send` and a
+    function-calling `validation_class`, the structured output is streamed and progress events for `table` are
+    forwarded to `send`.
+    """
+    node = node or inspect.currentframe().f_back.f_code.co_name
+    route_name, route = resolve_model_route(node)
+    cache_key = _request_key(messages, validation_class, method, model_settings=route_model_settings(route))
+    cache = get_llm_cache()
+    if cache:
+        hit, response = _cached_response(cache, cache_key, validation_class, node)
+        if hit:
+            _track(node, table, "cache", route_model_settings(route))
+            return response
+
+    backend = get_llm_backend()
+    for i in range(max_attempts):
+        model_settings = route_model_settings(route)
+
+        request_key = _request_key(messages, validation_class, method, model_settings=model_settings)
+
+        def call(cancel, hedge):
+            def invoke(stats):
+                if send and validation_class and method == "function_calling":
+                    llm = StreamingStructuredOutput(validation_class, send, node, label=table, model_settings=model_settings, cancel=cancel)
+                else:
+                    llm = get_llm(validation_class, method=method, **model_settings)
+                result = invoke_rate_limited(llm, messages, stats, cancel=cancel)
+                return _parsed(result) if validation_class else result
+
+            def live_call():
+                return _tracked_call(node, table, invoke, model_settings, hedge=hedge)
+
+            return backend.complete(request_key, node, live_call, validation_class, request=messages)
+
+        try:
+            if backend.offline:
+                response = call(None, False)
+                _track(node, table, backend.mode, model_settings)
+            else:
+                response = hedged_call(node, call, lambda r: _is_valid(r, validation_class, manual_validation))
+            if _is_valid(response, validation_class, manual_validation):
+                break
         except ValidationError:
             if logger:
                 logger("Regenerating on ValidationError.")
-    return None
-
-
-### GOOGLE - GEMINI
-### -------------------------- 
-# llm  = ChatOpenAI(model="gemini-2.5-pro-preview-05-06", temperature=0.2, max_tokens=16000, api_key=os.getenv("GEMINI_KEY"), base_url="https://generativelanguage.googleapis.com/v1beta/openai/")
-# parse_method = "function_calling"
-# parallel = True
-### --------------------------
-
-
-### LLM - RUNPOD
-### -------------------------- ###
-# llm  = ChatOpenAI(model="Qwen/Qwen3-30B-A3B", temperature=0.1, max_tokens=16000, base_url="http://localhost:8000/v1/", api_key="no_needed")
-# parse_method = "function_calling"
-# parallel = False
-### -------------------------- ###
-
-
-### LLM - Local Ollama
-# --------------------------
-# llm  = ChatOpenAI(model="qwen3:30b-a3b", temperature=0.1, max_tokens=7000, base_url="http://localhost:11434/v1/", api_key="ollama")
-# parallel = False
-# --------------------------
-
-### Previous LLMs
-# llm_router = llm.with_structured_output(NextNode, method=parse_method)
-# llm_table_extractor = llm.with_structured_output(DBSchema, method=parse_method)
-# llm_resource_generator = llm.with_structured_output(Resource, method=parse_method)
-# llm_test_generator = llm.with_structured_output(GeneratedCode, method=parse_method)
-# llm_test_and_code_reviser = llm.with_structured_output(CodeHistoryMessage, method=parse_method)
-# llm_readme_generator = llm.with_structured_output(Readme, method=parse_method)
\ No newline at end of file
+        except LLMDeadlineExceeded as e:
+            log(f"{e}; retrying")
+        if i + 1 < max_attempts:
+            get_usage_tracker().record_event(node, "retried_attempts")
+            route_name, route = _escalate(node, route_name, route)
+    else:
+        return None
+
+    if cache:
+        cache.put(cache_key, response)
+    return response
+
+
+def invoke_chat_with_tools(messages, tools, node=None, **model_settings) -> AIMessage:
+    """
+    Chat completion with `tools` bound on the model routed for `node` (`model_settings` override the route),
+    through the shared limits, the record/replay backend and usage tracking.
+    """
+    node = node or inspect.currentframe().f_back.f_code.co_name
+    model_settings = {**route_model_settings(resolve_model_route(node)[1]), **model_settings}
+    request_key = _request_key(messages, method="tools", tools=tools, model_settings=model_settings)
+
+    backend = get_llm_backend()
+
+    def call(cancel, hedge):
+        def invoke(stats):
+            llm = get_chat_model(**model_settings).bind_tools(tools)
+            return invoke_rate_limited(llm, messages, stats, cancel=cancel)
+
+        def live_call():
+            return _tracked_call(node, None, invoke, model_settings, hedge=hedge)
+
+        return backend.complete(request_key, node, live_call, AIMessage, request=messages)
+
+    if backend.offline:
+        response = call(None, False)
+        _track(node, None, backend.mode, model_settings)
+        return response
+    return hedged_call(node, call)
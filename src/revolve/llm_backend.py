@@ -0,0 +1,134 @@
+import json
+import os
+import threading
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional
+
+from pydantic import BaseModel
+
+from revolve.utils import log
+
+BACKEND_MODES = ("live", "record", "replay", "stub")
+
+
+class LLMBackendMissError(RuntimeError):
+    """Raised in replay or stub mode when there is no response for a request."""
+
+
+def _encode(response: Any) -> Any:
+    if isinstance(response, BaseModel):
+        return response.model_dump(mode="json")
+    return response
+
+
+def _decode(value: Any, response_class=None) -> Any:
+    if isinstance(response_class, type) and issubclass(response_class, BaseModel) and isinstance(value, dict):
+        return response_class.model_validate(value)
+    return value
+
+
+class LLMBackend:
+    """
+    Where LLM responses come from, chosen by LLM_BACKEND:
+
+    - live: call the API.
+    - record: call the API and store every request/response pair in `directory`, keyed by the request hash.
+    - replay: serve stored responses by request hash without touching the network; a miss raises.
+    - stub: serve scripted responses per node, in order (the last one repeats), for tests.
+    """
+
+    def __init__(self, mode: str = "live", directory: str = None, script: Dict[str, List[Any]] = None):
+        if mode not in BACKEND_MODES:
+            raise ValueError(f"Unknown LLM backend '{mode}', expected one of {', '.join(BACKEND_MODES)}")
+        self.mode = mode
+        self.directory = directory
+        self.script = script or {}
+        self._served = defaultdict(int)
+        self._lock = threading.Lock()
+        if mode in ("record", "replay") and not directory:
+            raise ValueError(f"LLM backend '{mode}' needs a recording directory (LLM_RECORD_DIR)")
+        if mode == "record":
+            os.makedirs(directory, exist_ok=True)
+
+    @property
+    def offline(self) -> bool:
+        return self.mode in ("replay", "stub")
+
+    def complete(self, key: str, node: str, live_call: Callable[[], Any], response_class=None, request=None) -> Any:
+        """Return the response for request `key` made by `node`, calling `live_call` only when the mode allows."""
+        if self.offline:
+            return self._serve(key, node, response_class)
+        response = live_call()
+        if self.mode == "record":
+            self._record(key, node, request, response)
+        return response
+
+    def _serve(self, key: str, node: str, response_class) -> Any:
+        if self.mode == "stub":
+            responses = self.script.get(node)
+            if not responses:
+                raise LLMBackendMissError(f"No scripted LLM response for node '{node}'")
+            with self._lock:
+                index = min(self._served[node], len(responses) - 1)
+                self._served[node] += 1
+            return _decode(responses[index], response_class)
+
+        path = self._path(key)
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            raise LLMBackendMissError(
+                f"No recorded LLM response for node '{node}' (request {key[:12]}); re-run with LLM_BACKEND=record"
+            )
+        return _decode(entry["response"], response_class)
+
+    def _record(self, key: str, node: str, request: Any, response: Any):
+        path = self._path(key)
+        try:
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(
+                    {"node": node, "request": _encode(request), "response": _encode(response)},
+                    f, indent=2, default=lambda obj: _encode(obj) if isinstance(obj, BaseModel) else str(obj),
+                )
+            os.replace(tmp_path, path)
+        except Exception as e:
+            log(f"Error recording LLM response for {node}: {e}")
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+
+_backend: Optional[LLMBackend] = None
+_backend_lock = threading.Lock()
+
+
+def load_stub_script(path: str) -> Dict[str, List[Any]]:
+    """A stub script is a JSON object mapping node names to the list of responses they receive, in order."""
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def get_llm_backend() -> LLMBackend:
+    """The shared backend configured by LLM_BACKEND (default live), LLM_RECORD_DIR and LLM_STUB_FILE."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            mode = os.getenv("LLM_BACKEND", "live").lower()
+            stub_file = os.getenv("LLM_STUB_FILE")
+            _backend = LLMBackend(
+                mode,
+                directory=os.getenv("LLM_RECORD_DIR", "llm_recordings"),
+                script=load_stub_script(stub_file) if mode == "stub" and stub_file else None,
+            )
+            if mode != "live":
+                log(f"LLM backend: {mode}")
+        return _backend
+
+
+def set_llm_backend(backend: Optional[LLMBackend]):
+    """Install `backend` for the process (e.g. a stub in tests); None re-reads the environment on next use."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
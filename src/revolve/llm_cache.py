@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, Optional, Tuple
+
+from langchain_core.messages import BaseMessage
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import BaseModel
+
+from revolve.utils import log
+
+
+def _json_default(obj):
+    if isinstance(obj, BaseMessage):
+        # Message ids are random per run (the graph assigns them); only the conversation itself identifies a request.
+        return {
+            "type": obj.type,
+            "content": obj.content,
+            "tool_calls": [
+                {"name": call["name"], "args": call["args"], "id": call.get("id")}
+                for call in getattr(obj, "tool_calls", None) or []
+            ],
+            "tool_call_id": getattr(obj, "tool_call_id", None),
+        }
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    return str(obj)
+
+
+class LLMResponseCache:
+    """
+    Content-addressed on-disk cache of LLM responses. Entries are keyed by a hash of the model settings, the
+    validation class schema and the messages, expire `ttl_seconds` after they were written (reads do not extend
+    them), and the least recently used ones are evicted once the directory grows past `max_bytes`; the file mtime
+    is only the LRU clock. Hits and misses are counted per node.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, ttl_seconds: float):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._stats = defaultdict(lambda: {"hits": 0, "misses": 0})
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(model_settings: Dict[str, Any], validation_class, method: str, messages, tools=None) -> str:
+        payload = {
+            "model": model_settings,
+            "method": method,
+            "schema": convert_to_openai_tool(validation_class) if validation_class else None,
+            "messages": messages,
+        }
+        if tools:
+            payload["tools"] = [convert_to_openai_tool(tool) for tool in tools]
+        encoded = json.dumps(payload, sort_keys=True, default=_json_default)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    def get(self, key: str, validation_class=None, node: str = "") -> Tuple[bool, Any]:
+        path = self._path(key)
+        hit, value = False, None
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+            if not self._expired(entry.get("created")):
+                value = entry["response"]
+                os.utime(path)  # mtime is the LRU clock
+                hit = True
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            log(f"Ignoring unreadable LLM cache entry {path}: {e}")
+
+        with self._lock:
+            self._stats[node]["hits" if hit else "misses"] += 1
+        if hit and isinstance(validation_class, type) and issubclass(validation_class, BaseModel):
+            value = validation_class.model_validate(value)
+        return hit, value
+
+    def put(self, key: str, response: Any):
+        path = self._path(key)
+        try:
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"created": time.time(), "response": response}, f, default=_json_default)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            log(f"Error writing LLM cache entry {path}: {e}")
+            return
+        self._evict()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                node: {**counts, "hit_rate": round(counts["hits"] / max(counts["hits"] + counts["misses"], 1), 3)}
+                for node, counts in self._stats.items()
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats.clear()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _expired(self, created: Optional[float]) -> bool:
+        return created is None or time.time() - created > self.ttl_seconds
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".json"):
+                    stat = entry.stat()
+                    expired = self._expired(_read_created(entry.path))
+                    entries.append((not expired, stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, _, size, _ in entries)
+            # Expired entries go first, then the least recently used until the cache fits.
+            for live, _, size, path in sorted(entries):
+                if live and total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except FileNotFoundError:
+                    pass
+
+
+_CREATED = re.compile(rb'^\{"created": ([0-9.eE+-]+)')
+
+
+def _read_created(path: str) -> Optional[float]:
+    """The entry's write time; put() writes it first, so a short prefix is enough and eviction stays cheap."""
+    try:
+        with open(path, "rb") as f:
+            match = _CREATED.match(f.read(64))
+        return float(match.group(1)) if match else None
+    except (OSError, ValueError):
+        return None
+
+
+_cache: Optional[LLMResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    """The shared response cache, or None unless LLM_CACHE_DIR is set."""
+    global _cache
+    directory = os.getenv("LLM_CACHE_DIR")
+    if not directory:
+        return None
+    with _cache_lock:
+        if _cache is None or _cache.directory != directory:
+            _cache = LLMResponseCache(
+                directory,
+                max_bytes=int(os.getenv("LLM_CACHE_MAX_BYTES", 512 * 1024 * 1024)),
+                ttl_seconds=float(os.getenv("LLM_CACHE_TTL_SECONDS", 7 * 24 * 3600)),
+            )
+        return _cache
@@ -0,0 +1,165 @@
+import math
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Optional
+
+from revolve.llm_usage import get_usage_tracker
+from revolve.utils import log
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    """An LLM call (including any hedge) did not return within LLM_CALL_DEADLINE_SECONDS."""
+
+
+class LLMCallCancelled(Exception):
+    """Raised inside a call that lost a hedge race or outlived its deadline."""
+
+
+class CancelToken(threading.Event):
+    """
+    Set to cancel one attempt of a hedged call. The attempt calls sent() once its request has left the rate-limit
+    queue, which starts the hedge and deadline clocks.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.sent_at = None
+        self._started = threading.Event()
+
+    def sent(self):
+        if self.sent_at is None:  # retries stay on the first request's clock
+            self.sent_at = time.monotonic()
+        self._started.set()
+
+    def finished(self):
+        self._started.set()
+
+    def wait_sent(self) -> Optional[float]:
+        """Block until the request is sent or the attempt ended without sending one; returns sent_at."""
+        self._started.wait()
+        return self.sent_at
+
+
+class LatencyHistory:
+    """Recent successful call latencies per node, used to decide when a call is slow enough to hedge."""
+
+    def __init__(self, size: int = 200):
+        self._latencies = defaultdict(lambda: deque(maxlen=size))
+        self._lock = threading.Lock()
+
+    def add(self, node: str, seconds: float):
+        with self._lock:
+            self._latencies[node].append(seconds)
+
+    def percentile(self, node: str, percentile: float, min_samples: int) -> Optional[float]:
+        with self._lock:
+            latencies = sorted(self._latencies[node])
+        if not latencies or len(latencies) < min_samples:
+            return None
+        index = min(len(latencies) - 1, max(0, math.ceil(percentile / 100 * len(latencies)) - 1))
+        return latencies[index]
+
+
+_history = LatencyHistory()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = 4 * int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm-call")
+        return _executor
+
+
+def hedge_settings():
+    """(hedge percentile or None, minimum samples, deadline seconds or None) from the environment."""
+    percentile = float(os.getenv("LLM_HEDGE_PERCENTILE", 0))
+    deadline = float(os.getenv("LLM_CALL_DEADLINE_SECONDS", 0))
+    return percentile or None, int(os.getenv("LLM_HEDGE_MIN_SAMPLES", 20)), deadline or None
+
+
+def _valid(response, is_valid) -> bool:
+    try:
+        return bool(is_valid(response))
+    except Exception:
+        return False
+
+
+def _timed(node, fn, cancel, hedge):
+    try:
+        response = fn(cancel, hedge)
+    finally:
+        cancel.finished()
+    if cancel.sent_at is not None:
+        _history.add(node, time.monotonic() - cancel.sent_at)
+    return response
+
+
+def hedged_call(node: str, fn: Callable[[CancelToken, bool], Any], is_valid: Callable[[Any], bool] = bool) -> Any:
+    """
+    Run fn(cancel, hedge) for `node`. Once the request has been in flight (time queued for a rate-limit slot not
+    counted) longer than LLM_HEDGE_PERCENTILE of the node's recent latencies, a duplicate is issued (hedge=True)
+    and the first valid response wins. Raises LLMDeadlineExceeded once the request has been in flight for
+    LLM_CALL_DEADLINE_SECONDS. Losers and deadline misses are cancelled: a streaming call stops and closes its
+    response at the next chunk, a blocking one finishes in the background and its late response is discarded.
+    Either way the call keeps its rate-limit slot until it returns, so LLM_MAX_CONCURRENCY is never exceeded.
+    If no response is valid, the last response (or the first error) is returned as is, so the caller's validation
+    retries take over. With neither hedging nor a deadline configured, fn runs on the calling thread.
+    """
+    percentile, min_samples, deadline = hedge_settings()
+    hedge_after = _history.percentile(node, percentile, min_samples) if percentile else None
+    if hedge_after is None and deadline is None:
+        return _timed(node, fn, CancelToken(), False)
+
+    executor = _get_executor()
+    tokens = [CancelToken()]
+    futures = {executor.submit(_timed, node, fn, tokens[0], False): False}
+    hedged, errors, responses = False, [], []
+    try:
+        started = tokens[0].wait_sent() or time.monotonic()
+        while futures:
+            elapsed = time.monotonic() - started
+            checkpoints = [deadline] if deadline else []
+            if hedge_after is not None and not hedged:
+                checkpoints.append(hedge_after)
+            timeout = max(0.0, min(checkpoints) - elapsed) if checkpoints else None
+
+            done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                is_hedge = futures.pop(future)
+                try:
+                    response = future.result()
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                if _valid(response, is_valid):
+                    if is_hedge:
+                        get_usage_tracker().record_event(node, "hedge_wins")
+                    return response
+                responses.append(response)
+            if done:
+                continue
+
+            elapsed = time.monotonic() - started
+            if deadline and elapsed >= deadline:
+                get_usage_tracker().record_event(node, "deadlines_exceeded")
+                raise LLMDeadlineExceeded(f"LLM call for {node} exceeded {deadline:g}s")
+            if hedge_after is not None and not hedged and elapsed >= hedge_after:
+                hedged = True
+                get_usage_tracker().record_event(node, "hedges")
+                log(f"Hedging {node}: no response after {elapsed:.1f}s (p{percentile:g} latency {hedge_after:.1f}s)")
+                tokens.append(CancelToken())
+                futures[executor.submit(_timed, node, fn, tokens[-1], True)] = True
+    finally:
+        for token in tokens:
+            token.set()
+
+    if responses:
+        return responses[-1]
+    raise errors[0]
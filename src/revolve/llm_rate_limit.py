@@ -0,0 +1,131 @@
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+import openai
+
+# Errors worth retrying: rate limits, overloaded or failing servers and dropped connections (timeouts included).
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError)
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `per_minute` tokens per minute. reserve() always succeeds and returns how
+    long the caller has to wait for its tokens, so waiting callers are served in the order they reserved.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        with self._lock:
+            self._refill()
+            # A single request larger than the bucket could never be served otherwise.
+            self.tokens -= min(amount, self.capacity)
+            return max(0.0, -self.tokens / self.rate)
+
+    def charge(self, amount: float):
+        """Account for tokens that were only known after the request, e.g. completion tokens."""
+        with self._lock:
+            self._refill()
+            self.tokens -= amount
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+class LLMRateLimiter:
+    """
+    Process-wide limits shared by every LLM call: at most `max_concurrency` requests in flight, plus optional
+    requests-per-minute and tokens-per-minute buckets. A 429 pauses all callers until its Retry-After has passed.
+    """
+
+    def __init__(self, max_concurrency: int, rpm: float = 0, tpm: float = 0):
+        self.max_concurrency = max_concurrency
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._paused_until = 0.0
+
+    def _delay(self, estimated_tokens: int) -> float:
+        delay = max(0.0, self._paused_until - time.monotonic())
+        if self.requests:
+            delay = max(delay, self.requests.reserve(1))
+        if self.tokens:
+            delay = max(delay, self.tokens.reserve(estimated_tokens))
+        return delay
+
+    @contextmanager
+    def slot(self, estimated_tokens: int = 0):
+        """Wait for the rate limits and a free concurrency slot, then hold the slot for one request."""
+        delay = self._delay(estimated_tokens)
+        if delay:
+            time.sleep(delay)
+        started = time.monotonic()
+        self._semaphore.acquire()
+        try:
+            yield delay + time.monotonic() - started
+        finally:
+            self._semaphore.release()
+
+    def backoff(self, attempt: int, error: Exception) -> float:
+        """
+        Seconds to wait before retrying after `error`: the server's Retry-After when it sent one, otherwise
+        exponential backoff with full jitter. Rate-limit errors pause every caller, not just this one.
+        """
+        delay = retry_after(error)
+        if delay is None:
+            delay = random.uniform(0, min(60.0, 0.5 * 2 ** attempt))
+        if isinstance(error, openai.RateLimitError):
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        return delay
+
+    def charge(self, tokens: int):
+        if self.tokens and tokens:
+            self.tokens.charge(tokens)
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        return None  # an HTTP date; fall back to backoff
+    return None
+
+
+def estimate_tokens(messages) -> int:
+    """Rough prompt size for the TPM bucket (~4 characters per token)."""
+    return len(json.dumps(messages, default=str)) // 4
+
+
+_limiter: Optional[LLMRateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> LLMRateLimiter:
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = LLMRateLimiter(
+                max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", 8)),
+                rpm=float(os.getenv("LLM_RPM", 0)),
+                tpm=float(os.getenv("LLM_TPM", 0)),
+            )
+        return _limiter
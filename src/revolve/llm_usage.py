@@ -0,0 +1,156 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+# USD per million tokens: (input, cached input, output). Extend or override with LLM_PRICING.
+DEFAULT_PRICING = {
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+}
+
+EVENTS = ("retried_attempts", "hedges", "hedge_wins", "deadlines_exceeded")
+
+USAGE_FIELDS = ("wall_seconds", "queue_seconds", "retries", "prompt_tokens", "completion_tokens", "cached_tokens", "cost")
+
+
+def get_pricing() -> Dict[str, tuple]:
+    """DEFAULT_PRICING updated from LLM_PRICING, a JSON object like {"my-model": [input, cached_input, output]}."""
+    pricing = dict(DEFAULT_PRICING)
+    raw = os.getenv("LLM_PRICING")
+    if raw:
+        pricing.update({model: tuple(prices) for model, prices in json.loads(raw).items()})
+    return pricing
+
+
+def call_cost(model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> Optional[float]:
+    """Cost of one call in USD, or None for a model without a price. Cached tokens are part of prompt_tokens."""
+    prices = get_pricing().get(model)
+    if prices is None:
+        return None
+    input_price, cached_price, output_price = prices
+    cost = (prompt_tokens - cached_tokens) * input_price + cached_tokens * cached_price + completion_tokens * output_price
+    return round(cost / 1_000_000, 6)
+
+
+def usage_from_response(response) -> Dict[str, int]:
+    """Token counts from an AIMessage, or from the raw message of an include_raw structured-output result."""
+    if isinstance(response, dict) and "raw" in response:
+        response = response["raw"]
+    usage = getattr(response, "usage_metadata", None) or {}
+    return {
+        "prompt_tokens": usage.get("input_tokens", 0),
+        "completion_tokens": usage.get("output_tokens", 0),
+        "cached_tokens": (usage.get("input_token_details") or {}).get("cache_read", 0),
+    }
+
+
+class LLMUsageTracker:
+    """
+    Collects one record per LLM call made during a workflow run: the node and table it was made for, where the
+    response came from (api, cache, replay or stub), wall time, time spent queued behind the rate limits, retries,
+    token counts and cost, plus per-node counts of retried attempts, hedges and missed deadlines (EVENTS).
+    summary() aggregates them per node and per table.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: List[Dict[str, Any]] = []
+        self._events = defaultdict(lambda: dict.fromkeys(EVENTS, 0))
+        self.started = time.time()
+
+    def record(self, node: str, table: str = None, model: str = None, source: str = "api", hedge: bool = False, **usage):
+        call = {"node": node, "table": table, "model": model, "source": source, "hedge": hedge}
+        call.update({field: usage.get(field, 0) for field in USAGE_FIELDS if field != "cost"})
+        call["wall_seconds"] = round(call["wall_seconds"], 3)
+        call["queue_seconds"] = round(call["queue_seconds"], 3)
+        call["cost"] = call_cost(model, call["prompt_tokens"], call["completion_tokens"], call["cached_tokens"]) if source == "api" else 0.0
+        if "error" in usage:
+            call["error"] = usage["error"]
+        with self._lock:
+            self._calls.append(call)
+
+    def record_event(self, node: str, event: str):
+        with self._lock:
+            self._events[node][event] += 1
+
+    def reset(self):
+        with self._lock:
+            self._calls.clear()
+            self._events.clear()
+            self.started = time.time()
+
+    def calls(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._calls)
+
+    def summary(self) -> Dict[str, Any]:
+        calls = self.calls()
+        with self._lock:
+            events = {node: dict(counts) for node, counts in self._events.items()}
+        by_node = {node: _aggregate(group) for node, group in _group(calls, "node").items()}
+        for node, counts in events.items():
+            by_node.setdefault(node, _aggregate([])).update(counts)
+        totals = _aggregate(calls)
+        totals.update({event: sum(counts[event] for counts in events.values()) for event in EVENTS})
+        return {
+            "run_seconds": round(time.time() - self.started, 3),
+            "totals": totals,
+            "by_node": by_node,
+            "by_table": {table: _aggregate(group) for table, group in _group(calls, "table").items() if table},
+            "calls": calls,
+        }
+
+    def write_summary(self, folder: str) -> str:
+        path = os.path.join(folder, "llm_usage_summary.json")
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=4)
+        return path
+
+
+def _group(calls, field):
+    groups = defaultdict(list)
+    for call in calls:
+        groups[call[field]].append(call)
+    return groups
+
+
+def _aggregate(calls) -> Dict[str, Any]:
+    totals = {"calls": len(calls), "errors": sum(1 for call in calls if "error" in call)}
+    for field in USAGE_FIELDS:
+        totals[field] = round(sum(call[field] or 0 for call in calls), 6)
+    totals["unpriced_calls"] = sum(1 for call in calls if call["cost"] is None)
+    totals["hedge_calls"] = sum(1 for call in calls if call["hedge"])
+    totals["hedge_cost"] = round(sum(call["cost"] or 0 for call in calls if call["hedge"]), 6)
+    totals["cached_prompt_share"] = round(totals["cached_tokens"] / max(totals["prompt_tokens"], 1), 3)
+    return totals
+
+
+def format_summary(summary: Dict[str, Any]) -> str:
+    """One-line overview for the chat stream: totals plus the node that cost the most time."""
+    totals = summary["totals"]
+    text = (
+        f"LLM usage: {totals['calls']} calls, {totals['prompt_tokens']} prompt / {totals['completion_tokens']} "
+        f"completion tokens ({totals['cached_prompt_share']:.0%} of prompt tokens cached), ${totals['cost']:.4f}"
+    )
+    if summary["by_node"]:
+        node, stats = max(summary["by_node"].items(), key=lambda item: item[1]["wall_seconds"])
+        text += f"; slowest node {node} ({stats['wall_seconds']:.1f}s over {stats['calls']} calls)"
+    if totals.get("hedges") or totals.get("retried_attempts"):
+        text += (
+            f"; {totals['retried_attempts']} retried attempts, {totals['hedges']} hedges "
+            f"({totals['hedge_wins']} won, ${totals['hedge_cost']:.4f})"
+        )
+    return text
+
+
+_tracker = LLMUsageTracker()
+
+
+def get_usage_tracker() -> LLMUsageTracker:
+    return _tracker
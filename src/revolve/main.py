@@ -22,8 +22,11 @@ from revolve.nodes import (
     should_continue_tool_call
 )
 
-from revolve.external import get_db_type
+from revolve.external import get_db_type, get_source_folder
 from revolve.tools import get_tools
+from revolve.llm_cache import get_llm_cache
+from revolve.llm_usage import format_summary, get_usage_tracker
+from revolve.utils import log
 
 
 def send_message(message):
@@ -87,7 +90,7 @@ def run_workflow(task=None, db_config=None, send=None):
 
 
     graph.add_conditional_edges(
-        "generate_prompt_for_code_generation", lambda state: [Send("process_table", s) for s in state["DBSchema"]["tables"]], ["process_table"]
+        "generate_prompt_for_code_generation", lambda state: [Send("process_table", {**s, "send": state.get("send")}) for s in state["DBSchema"]["tables"]], ["process_table"]
     )
 
     graph.add_edge("process_table", "generate_api")
@@ -106,6 +109,12 @@ def run_workflow(task=None, db_config=None, send=None):
             }
         ]
 
+    llm_cache = get_llm_cache()
+    if llm_cache:
+        llm_cache.reset_stats()
+    usage_tracker = get_usage_tracker()
+    usage_tracker.reset()
+
     for event in workflow.stream({"messages": task, "send":send,"test_mode": test_mode}):
         name = ""
         text = ""
@@ -122,6 +131,24 @@ def run_workflow(task=None, db_config=None, send=None):
                         "name":name,
                         "level":level
                     })
+
+    if llm_cache:
+        for node, stats in llm_cache.stats().items():
+            log(f"LLM cache {node}: {stats['hits']} hits / {stats['misses']} misses ({stats['hit_rate']:.0%})")
+
+    usage_summary = usage_tracker.summary()
+    try:
+        log(f"LLM usage summary written to {usage_tracker.write_summary(get_source_folder())}")
+    except Exception as e:
+        log(f"Error writing LLM usage summary: {e}")
+    send({
+        "status": "processing",
+        "text": format_summary(usage_summary),
+        "name": "llm_usage",
+        "level": "system",
+        "usage": {key: value for key, value in usage_summary.items() if key != "calls"},
+    })
+
     # send({
     #     "status":"done",
     #     "text":"Task completed.",
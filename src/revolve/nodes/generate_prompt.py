@@ -28,6 +28,15 @@ def generate_prompt_for_code_generation(state: State):
 
     structured_db_response = invoke_llm(messages, max_attempts=3, validation_class=DBSchema, method="function_calling")
 
+    # Planner statistics travel with each table so process_table can pick indexed filters and paging strategy.
+    try:
+        table_statistics = adapter.get_table_statistics()
+    except Exception as e:
+        log(f"Could not read table statistics: {e}", send)
+        table_statistics = {}
+    for table in structured_db_response["tables"]:
+        table["statistics"] = table_statistics.get(table["table_name"])
+
     new_trace = {
         "node_name": "generate_prompt_for_code_generation",
         "node_type": "db",
@@ -1,9 +1,10 @@
 
+import re
 from datetime import datetime
 
 from revolve.data_types import Resource, Table
 from revolve.utils import log, save_python_code, read_python_code_template
-from revolve.prompts import get_process_table_prompt
+from revolve.prompts import get_process_table_prompt, is_large_table
 from revolve.llm import invoke_llm
 
 
@@ -16,10 +17,19 @@ def process_table(table_state:Table):
     utils_template = read_python_code_template("db_utils.py")
     individual_prompt = table_state["individual_prompt"]
     schemas = str(columns)
+    table_statistics = table_state.get("statistics")
 
-    messages = get_process_table_prompt(utils_template=utils_template, code_template=code_template, table_name=table_name, schemas=schemas, individual_prompt=individual_prompt)
+    if is_large_table(table_statistics):
+        column_names = [column.get("column") for column in columns if isinstance(column, dict)]
+        for column in unindexed_filter_columns(individual_prompt, table_statistics, column_names):
+            log(
+                f"⚠️ '{column}' is requested on {table_name} (~{table_statistics['estimated_rows']} rows) but has no index",
+                send=table_state.get("send"),
+            )
+
+    messages = get_process_table_prompt(utils_template=utils_template, code_template=code_template, table_name=table_name, schemas=schemas, individual_prompt=individual_prompt, table_statistics=table_statistics)
     
-    structured_resource_response = invoke_llm(messages, max_attempts=3, validation_class=Resource, method="function_calling")
+    structured_resource_response = invoke_llm(messages, max_attempts=3, validation_class=Resource, method="function_calling", send=table_state.get("send"), table=table_name)
 
     log(f"Resource generated for  {table_name}")
     save_python_code(
@@ -41,3 +51,13 @@ def process_table(table_state:Table):
         "resources": [structured_resource_response],
         "trace": [new_trace]
     }
+
+
+def unindexed_filter_columns(individual_prompt: str, table_statistics: dict, column_names: list = ()) -> list:
+    """Columns named in the request that are not the leading column of any index."""
+    indexed = {index["columns"][0] for index in table_statistics.get("indexes", []) if index.get("columns")}
+    candidates = dict.fromkeys([*table_statistics.get("columns", {}), *filter(None, column_names)])
+    return [
+        column for column in candidates
+        if column not in indexed and re.search(rf"\b{re.escape(column)}\b", individual_prompt, re.IGNORECASE)
+    ]
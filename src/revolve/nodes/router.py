@@ -19,7 +19,9 @@ def router_node(state: State):
 
     if not next_node:
         if test_mode:
-            adapter.clone_db()
+            clone_report = adapter.clone_db()
+            if clone_report:
+                log(f"Test database cloned via {clone_report['strategy']} in {clone_report['seconds']}s", send)
 
         init_or_attach_git_repo()
         branch_name = create_branch_with_timestamp()
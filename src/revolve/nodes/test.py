@@ -46,7 +46,7 @@ def test_node(state: State):
             resource_file_name = test_item["resource_file_name"]
         )
 
-        structured_test_response = invoke_llm(messages, max_attempts=3, validation_class=GeneratedCode, method="function_calling", manual_validation=True)
+        structured_test_response = invoke_llm(messages, max_attempts=3, validation_class=GeneratedCode, method="function_calling", manual_validation=True, send=send, table=table_name)
         full_test_code = structured_test_response.full_test_code
 
 
@@ -126,7 +126,7 @@ def test_node(state: State):
 
 
                 
-                new_test_code_response = invoke_llm(new_messages, max_attempts=3, validation_class=CodeHistoryMessage, method="function_calling", manual_validation=True)
+                new_test_code_response = invoke_llm(new_messages, max_attempts=3, validation_class=CodeHistoryMessage, method="function_calling", manual_validation=True, send=send, table=table_name)
                 test_item["iteration_count"] += 1
 
                 if new_test_code_response.code_type == "resource":
@@ -1,7 +1,7 @@
 
 
 
-from langchain_openai import ChatOpenAI
+from revolve.llm import invoke_chat_with_tools
 from revolve.data_types import State
 from revolve.tools import get_tools
 from langchain_core.messages import ToolMessage
@@ -10,15 +10,9 @@ from revolve.functions import log
 
 
 def tool_handler(state:State):
-    # [TODO] llm_model will be imported from revolve.llm
-    llm_model = ChatOpenAI(
-    model="gpt-4o",
-    temperature=0.2,
-    )
-    llm_with_tools = llm_model.bind_tools(get_tools())
     messages = state.get("messages", [])
 
-    response = llm_with_tools.invoke(messages)
+    response = invoke_chat_with_tools(messages, get_tools())
     return {"messages": [response]}
 
 
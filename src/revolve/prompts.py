@@ -1,3 +1,4 @@
+import os
 
 from revolve.external import get_db_type
 from revolve.data_types import GeneratedCode, CodeHistoryMessage
@@ -8,9 +9,31 @@ prompt_list = {
         """
 You are a table-schema extractor. When given a full database schema, identify and extract only the table(s) the user intends to work with.
 For each requested table, generate a concise instruction—without including the schema itself—such as:
-“Create POST method for the X table."""
+“Create POST method for the X table.
+Tables outside the public Postgres schema are named "schema.table" (e.g. "tenant_a.orders"); keep table names exactly as given."""
 }
 
+def layout_prompt(system_prompt: str, shared_context: list, request: list) -> list:
+    """
+    Build messages for one of many similar per-table calls: the system prompt and the shared context (templates,
+    api.py, ...) come first and the per-table request last. Providers cache prompts by exact prefix, so the
+    shared part must not contain any per-table value for the calls to reuse it.
+    """
+    def render(sections):
+        return "".join(f"\n{section}" for section in sections)
+
+    return [
+        {
+            "role": "system",
+            "content": system_prompt,
+        },
+        {
+            "role": "user",
+            "content": render(shared_context) + render(request),
+        },
+    ]
+
+
 def get_test_generation_prompt(test_example: str, api_code: str, table_name: str, schema: str, utils: str, resouce_file: str, resource_file_name:str) -> str:
     system_prompt = f"""
 Generate comprehensive test cases (max:10) for a Python API that implements CRUD (Create, Read, Update, Delete) and LIST operations based on the provided schema. The schema may include unique constraints, data types (e.g., UUID, JSONB, timestamps), and nullable fields. The tests must adhere to the following guidelines:
@@ -43,25 +66,15 @@ Pay attention to datatypes such as text array when making payloads and send the
 Example test file should be like this:
 {test_example}"""
 
-    user_message = f"""
-Here is my api code for the endpoints.
-{api_code}
-Here are the schema of the table ({table_name}) is used in the api:
-{schema}
-Here is the db_utils file (import methods from db_utils.py if needed):
-{utils}
-Write test methods foreach function in the resource code:
-{resouce_file}"""
-    return [
-        {
-            "role": "system",
-            "content": system_prompt,
-        },
-        {
-            "role": "user",
-            "content": user_message,
-        },
+    shared_context = [
+        f"Here is my api code for the endpoints.\n{api_code}",
+        f"Here is the db_utils file (import methods from db_utils.py if needed):\n{utils}",
     ]
+    request = [
+        f"Here are the schema of the table ({table_name}) is used in the api:\n{schema}",
+        f"Write test methods foreach function in the resource code:\n{resouce_file}",
+    ]
+    return layout_prompt(system_prompt, shared_context, request)
 
 def get_test_generation_prompt_ft(test_example: str, api_code: str, table_name: str, schema: str, utils: str, resouce_file: str, resource_file_name: str) -> str:
     
@@ -138,35 +151,22 @@ Always print the response content in the test for better debugging.
 Be careful with non-nullable columns when generating tests.
 Don't assume any id is already in the database.
 Do not use placeholder values, everything should be ready to use."""
-    new_user_message = f"""
-My initial goal was {individual_prompt}.
+    shared_context = [
+        f"This is the example resource code in case you need to refer:\n{example_resource_code}",
+        f"The api and routes are here:\n{api_code}",
+        f"The db_utils file is here (import methods from db_utils.py if needed):\n{utils}",
+    ]
+    request = [
+        f"""My initial goal was {individual_prompt}.
 However some tests are failing. 
 Please fix the test, api or the resource code, which one is needed.
-I only need the code, do not add any other comments or explanations.
-Here is the resource code :
-{source_code}
-This is the example resource code in case you need to refer:
-{example_resource_code}
-Here is the test code:
-{test_code}
-The api and routes are here:
-{api_code}
-The db_utils file is here (import methods from db_utils.py if needed):
-{utils}
-The schema of the related {table_name} table is:
-{schema}
-And Here is the report of the failing tests:
-{pytest_response}"""
-    return [
-        {
-            "role": "system",
-            "content": new_system_message,
-        },
-        {
-            "role": "user",
-            "content": new_user_message,
-        },
+I only need the code, do not add any other comments or explanations.""",
+        f"Here is the resource code :\n{source_code}",
+        f"Here is the test code:\n{test_code}",
+        f"The schema of the related {table_name} table is:\n{schema}",
+        f"And Here is the report of the failing tests:\n{pytest_response}",
     ]
+    return layout_prompt(new_system_message, shared_context, request)
 
 def get_test_revising_prompt_ft(individual_prompt: str, source_code: str, example_resource_code: str, test_code: str, api_code: str, table_name: str, schema: str, utils: str, pytest_response: str, resource_file_name:str) -> str:
     raw_output_structure = CodeHistoryMessage.model_json_schema()
@@ -221,7 +221,44 @@ I only need the code, do not add any other comments or explanations.
         },
     ]
 
-def get_process_table_prompt(utils_template: str, code_template: str, table_name: str, schemas: str, individual_prompt: str) -> list:
+def is_large_table(table_statistics: dict) -> bool:
+    if not table_statistics:
+        return False
+    return table_statistics.get("estimated_rows", 0) >= int(os.getenv("LARGE_TABLE_ROWS", 1000000))
+
+
+def get_table_statistics_prompt(table_statistics: dict) -> str:
+    if not table_statistics:
+        return ""
+
+    indexes = [
+        f"{index['name']} ({', '.join(index['columns'] or [])}; {index['method']}{', unique' if index['unique'] else ''})"
+        for index in table_statistics.get("indexes", [])
+    ]
+    prompt = f"""
+Table statistics: ~{table_statistics.get("estimated_rows", 0)} rows, {table_statistics.get("total_bytes", 0) // (1024 * 1024)} MB
+Indexes: {"; ".join(indexes) or "none"}
+"""
+    if table_statistics.get("columns"):
+        prompt += f"Column selectivity (n_distinct, null_frac): {table_statistics['columns']}\n"
+
+    if is_large_table(table_statistics):
+        if get_db_type() == "mongodb":
+            prompt += """This is a large collection:
+- Only offer filters and sort fields backed by an index (prefix of a compound index first).
+- Paginate on an indexed sort key (find({key: {"$gt": last seen value}}).sort(key).limit(n)) instead of large skips.
+- Do not call count_documents({}) for totals; use estimated_document_count() (or omit the total).
+"""
+        else:
+            prompt += """This is a large table:
+- Only offer filters and sort orders on indexed columns (leading index column first).
+- Use keyset pagination (WHERE <sort key> > last seen value ORDER BY <sort key> LIMIT n) instead of large OFFSETs.
+- Do not run an exact COUNT(*) for totals; return the estimate from pg_class.reltuples (or omit the total).
+"""
+    return prompt
+
+
+def get_process_table_prompt(utils_template: str, code_template: str, table_name: str, schemas: str, individual_prompt: str, table_statistics: dict = None) -> list:
     
     system_prompt = f"""
 Generate resource code according to the user request.
@@ -236,6 +273,8 @@ While creating List functionality, provide functionality to sort, order by and f
 key columns as well as skip , limit and total for pagination support. If the search filter is a date field, provide functionality to match greater than,
 less than and equal to date. Filter may not be specified - handle those cases as well.
 There could be multiple endpoints for the same resource.
+If the table name is schema-qualified (e.g. "tenant_a.orders"), query it through table_identifier from db_utils and
+use only the table part, without the schema, in uri, resource object and file names.
 Use methods from db_utils if needed. Here is the db_utils.py file:
 {utils_template}
 Here are the templates for the generation:
@@ -248,24 +287,14 @@ resouce_code : {code_template}
 """
     
 
-    # add schemas and individual prompt to the user prompt
-    user_prompt = f"""
-Task : {individual_prompt}
-Table Name : {table_name}
-Schema : {schemas}
-"""
-
-    messages = [
-        {
-            "role": "system",
-            "content": system_prompt
-        },
-        {
-            "role": "user",
-            "content": user_prompt
-        }
+    # The system prompt only holds run-wide templates; everything about the table goes last (see layout_prompt).
+    request = [
+        f"Task : {individual_prompt}",
+        f"Table Name : {table_name}",
+        f"Schema : {schemas}",
+        get_table_statistics_prompt(table_statistics),
     ]
-    return messages
+    return layout_prompt(system_prompt, [], request)
 
 def get_readme_prompt(api_code: str) -> list:
     messages =  [
@@ -1,6 +1,7 @@
 import uuid
 import os
 import psycopg2
+from psycopg2 import sql
 from datetime import datetime, date
 import json
 from uuid import UUID
@@ -18,6 +19,10 @@ def get_db_connection(test_mode):
     except psycopg2.Error as e:
         raise Exception(f"Database connection error: {e}")
 
+def table_identifier(table_name):
+    """Quote a table name, optionally schema-qualified ("tenant_a.orders"), for psycopg2.sql queries."""
+    return sql.Identifier(*table_name.split("."))
+
 def json_serial(obj):
     if isinstance(obj, (datetime, date)):
         return obj.isoformat()
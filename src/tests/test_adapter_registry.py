@@ -0,0 +1,38 @@
+import unittest
+from unittest import mock
+
+import revolve.db as db
+
+
+class AdapterRegistryTestCase(unittest.TestCase):
+    def setUp(self):
+        db.close_adapters()
+        patcher = mock.patch.object(db, "_load_adapter", side_effect=lambda db_type: mock.Mock(name=db_type))
+        self.load_adapter = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(db.close_adapters)
+
+    def test_reuses_adapter_for_same_config(self):
+        with mock.patch.dict("os.environ", {"DB_NAME": "shop", "DB_PORT": "5432"}):
+            first = db.get_adapter("postgres")
+            self.assertIs(first, db.get_adapter("postgres"))
+        self.assertEqual(1, self.load_adapter.call_count)
+        self.assertEqual(1, db.live_adapter_count())
+
+    def test_closes_adapter_when_config_changes(self):
+        with mock.patch.dict("os.environ", {"DB_NAME": "shop"}):
+            old = db.get_adapter("postgres")
+        with mock.patch.dict("os.environ", {"DB_NAME": "crm"}):
+            new = db.get_adapter("postgres")
+
+        self.assertIsNot(old, new)
+        old.close.assert_called_once()
+        self.assertEqual(1, db.live_adapter_count())
+
+        db.close_adapters()
+        new.close.assert_called_once()
+        self.assertEqual(0, db.live_adapter_count())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+
+from revolve.db.postgres_adapter import PostgresAdapter
+
+
+def links(**columns):
+    return {column: {"reltype": "many-to-one", "links_to_table": table} for column, table in columns.items()}
+
+
+class DependencyLevelsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.adapter = PostgresAdapter()
+
+    def test_tables_follow_their_parents(self):
+        dependencies = {
+            "customers": {},
+            "orders": links(customer_id="customers"),
+            "order_items": links(order_id="orders", product_id="products"),
+        }
+        levels = self.adapter.dependency_levels(dependencies)
+
+        self.assertEqual([["customers", "products"], ["orders"], ["order_items"]], levels)
+
+    def test_cycles_are_collapsed_into_one_level(self):
+        dependencies = {
+            "employees": links(department_id="departments", manager_id="employees"),
+            "departments": links(head_id="employees"),
+            "devices": links(assigned_to="employees"),
+        }
+        levels = self.adapter.dependency_levels(dependencies)
+
+        self.assertEqual([["departments", "employees"], ["devices"]], levels)
+        self.assertRaises(ValueError, self.adapter.topological_sort, dependencies)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+import json
+import os
+import unittest
+from unittest import mock
+
+from langchain_core.messages import AIMessageChunk
+from pydantic import BaseModel
+
+from revolve import llm
+from revolve.data_types import DBSchema
+from revolve.llm_backend import LLMBackend, set_llm_backend
+from revolve.llm_usage import get_usage_tracker
+
+
+class TableCode(BaseModel):
+    code: str
+
+
+def _tool_call_chunks():
+    pieces = ['{"code": "', "def get_orders", "():", ' pass"}']
+    for index, piece in enumerate(pieces):
+        yield AIMessageChunk(
+            content="",
+            tool_call_chunks=[{"name": "TableCode" if index == 0 else None, "args": piece, "id": "call_1", "index": 0}],
+        )
+    yield AIMessageChunk(content="", usage_metadata={"input_tokens": 20, "output_tokens": 9, "total_tokens": 29})
+
+
+class StreamingProgressTestCase(unittest.TestCase):
+    def setUp(self):
+        chat_model = mock.Mock()
+        chat_model.bind_tools.return_value.stream.side_effect = lambda messages: _tool_call_chunks()
+        for patcher in (
+            mock.patch.object(llm, "get_chat_model", return_value=chat_model),
+            mock.patch.object(llm, "_models", {}),
+            mock.patch.dict(os.environ, {"LLM_CACHE_DIR": ""}),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        set_llm_backend(LLMBackend("live"))
+        self.addCleanup(set_llm_backend, None)
+        get_usage_tracker().reset()
+        self.addCleanup(get_usage_tracker().reset)
+
+    def invoke(self, interval):
+        events = []
+        with mock.patch.dict(os.environ, {"LLM_PROGRESS_INTERVAL": interval}):
+            response = llm.invoke_llm(
+                [("user", "write the orders API")], validation_class=TableCode, node="process_table",
+                manual_validation=True, send=events.append, table="orders",
+            )
+        return response, events
+
+    def test_progress_events_carry_table_and_chunk_count(self):
+        response, events = self.invoke("0")
+
+        self.assertEqual(TableCode(code="def get_orders(): pass"), response)
+        self.assertEqual([1, 2, 3, 4, 5], [event["chunks"] for event in events])
+        self.assertEqual({"orders"}, {event["table"] for event in events})
+        self.assertEqual({"process_table"}, {event["name"] for event in events})
+        self.assertIn("first token", events[0]["text"])
+        self.assertEqual(9, get_usage_tracker().summary()["by_table"]["orders"]["completion_tokens"])
+
+    def test_progress_events_are_rate_limited(self):
+        _, events = self.invoke("60")
+
+        self.assertEqual(1, len(events))
+        self.assertEqual(1, events[0]["chunks"])
+
+
+class ModelRoutingTestCase(unittest.TestCase):
+    def setUp(self):
+        env = {"OPENAI_MODEL": "gpt-4.1", "OPENAI_FAST_MODEL": "gpt-4.1-mini", "LLM_MODEL_ROUTES": "", "LLM_CACHE_DIR": ""}
+        patcher = mock.patch.dict(os.environ, env)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        get_usage_tracker().reset()
+        self.addCleanup(get_usage_tracker().reset)
+        self.addCleanup(set_llm_backend, None)
+
+    def test_aliases_resolve_to_their_route(self):
+        self.assertEqual(("fast", {"model": "gpt-4.1-mini", "escalate_to": "default"}),
+                         llm.resolve_model_route("check_user_request"))
+        self.assertEqual(("default", {}), llm.resolve_model_route("process_table"))
+        self.assertEqual({"model": "gpt-4o", "max_tokens": None},
+                         llm.route_model_settings(llm.resolve_model_route("tool_handler")[1]))
+
+    def test_override_adds_and_replaces_routes(self):
+        routes = {
+            "local": {"model": "llama3", "base_url": "http://localhost:11434/v1", "api_key_env": "LOCAL_KEY"},
+            "process_table": "local",
+            "check_user_request": "default",
+        }
+        with mock.patch.dict(os.environ, {"LLM_MODEL_ROUTES": json.dumps(routes), "LOCAL_KEY": "secret"}):
+            name, route = llm.resolve_model_route("process_table")
+            self.assertEqual("local", name)
+            self.assertEqual(
+                {"model": "llama3", "base_url": "http://localhost:11434/v1", "api_key": "secret"},
+                llm.route_model_settings(route),
+            )
+            self.assertEqual(("default", {}), llm.resolve_model_route("check_user_request"))
+
+    def test_malformed_overrides_are_ignored(self):
+        for raw in ("{not json", "[1, 2]", json.dumps({"check_user_request": 3})):
+            with self.subTest(raw=raw), mock.patch.dict(os.environ, {"LLM_MODEL_ROUTES": raw}):
+                self.assertEqual("fast", llm.resolve_model_route("check_user_request")[0])
+
+        cycle = json.dumps({"a": "b", "b": "a", "generate_api": "a"})
+        with mock.patch.dict(os.environ, {"LLM_MODEL_ROUTES": cycle}):
+            self.assertEqual(("default", {}), llm.resolve_model_route("generate_api"))
+
+    def test_failed_validation_escalates_to_the_next_route(self):
+        tables = {"tables": [{"table_name": "orders", "columns": []}]}
+        set_llm_backend(LLMBackend("stub", script={"generate_prompt_for_code_generation": [{}, tables]}))
+
+        response = llm.invoke_llm([("user", "orders")], validation_class=DBSchema, node="generate_prompt_for_code_generation")
+
+        self.assertEqual(tables, response)
+        summary = get_usage_tracker().summary()
+        self.assertEqual(["gpt-4.1-mini", "gpt-4.1"], [call["model"] for call in summary["calls"]])
+        self.assertEqual(1, summary["by_node"]["generate_prompt_for_code_generation"]["retried_attempts"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import tempfile
+import unittest
+
+from revolve.data_types import ClassifyUserRequest
+from revolve.llm_backend import LLMBackend, LLMBackendMissError
+
+
+class LLMBackendTestCase(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_replay_serves_recorded_responses_without_calling_the_api(self):
+        recorder = LLMBackend("record", directory=self.directory)
+        response = ClassifyUserRequest(classification="create_crud_task", message="ok")
+        recorded = recorder.complete("abc", "check_user_request", lambda: response, ClassifyUserRequest)
+        self.assertEqual(response, recorded)
+
+        replayer = LLMBackend("replay", directory=self.directory)
+
+        def live_call():
+            raise AssertionError("replay must not call the API")
+
+        self.assertEqual(response, replayer.complete("abc", "check_user_request", live_call, ClassifyUserRequest))
+        with self.assertRaises(LLMBackendMissError):
+            replayer.complete("missing", "check_user_request", live_call, ClassifyUserRequest)
+
+    def test_stub_serves_scripted_responses_in_order(self):
+        backend = LLMBackend("stub", script={"generate_prompt": [{"tables": []}, {"tables": [{"table_name": "t"}]}]})
+
+        self.assertEqual({"tables": []}, backend.complete("a", "generate_prompt", None))
+        self.assertEqual({"tables": [{"table_name": "t"}]}, backend.complete("b", "generate_prompt", None))
+        self.assertEqual({"tables": [{"table_name": "t"}]}, backend.complete("c", "generate_prompt", None))
+        with self.assertRaises(LLMBackendMissError):
+            backend.complete("d", "report_node", None)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from revolve.data_types import ClassifyUserRequest, Readme
+from revolve.llm_cache import LLMResponseCache
+
+
+class LLMResponseCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_round_trip_and_per_node_stats(self):
+        cache = LLMResponseCache(self.directory, max_bytes=10 ** 6, ttl_seconds=60)
+        messages = [{"role": "user", "content": "Create CRUD operations for orders"}]
+        key = cache.key({"model": "gpt-4.1"}, ClassifyUserRequest, "function_calling", messages)
+
+        self.assertEqual((False, None), cache.get(key, ClassifyUserRequest, node="check_user_request"))
+        cache.put(key, ClassifyUserRequest(classification="create_crud_task", message="ok"))
+        hit, response = cache.get(key, ClassifyUserRequest, node="check_user_request")
+
+        self.assertTrue(hit)
+        self.assertEqual(ClassifyUserRequest(classification="create_crud_task", message="ok"), response)
+        self.assertEqual({"hits": 1, "misses": 1, "hit_rate": 0.5}, cache.stats()["check_user_request"])
+        self.assertNotEqual(key, cache.key({"model": "gpt-4.1-mini"}, ClassifyUserRequest, "function_calling", messages))
+
+    def test_expired_and_oversized_entries_are_dropped(self):
+        cache = LLMResponseCache(self.directory, max_bytes=150, ttl_seconds=60)
+        cache.put("old", {"md_content": "x" * 50})
+        past = time.time() - 30
+        os.utime(os.path.join(self.directory, "old.json"), (past, past))
+        cache.put("new", {"md_content": "y" * 50})
+
+        self.assertFalse(cache.get("old", Readme)[0])
+        self.assertTrue(cache.get("new", Readme)[0])
+
+        cache.ttl_seconds = -1
+        self.assertFalse(cache.get("new", Readme)[0])
+
+    def test_reads_do_not_extend_the_ttl(self):
+        cache = LLMResponseCache(self.directory, max_bytes=10 ** 6, ttl_seconds=2)
+        with mock.patch("revolve.llm_cache.time.time", return_value=1000.0):
+            cache.put("entry", {"md_content": "x"})
+        for now in (1000.5, 1001.0, 1001.5, 1002.0):
+            with mock.patch("revolve.llm_cache.time.time", return_value=now):
+                self.assertTrue(cache.get("entry", Readme)[0])
+        with mock.patch("revolve.llm_cache.time.time", return_value=1002.5):
+            self.assertFalse(cache.get("entry", Readme)[0])
+            cache.put("other", {"md_content": "y"})
+        self.assertFalse(os.path.exists(os.path.join(self.directory, "entry.json")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import threading
+import time
+import unittest
+from unittest import mock
+
+from revolve import llm_hedge
+from revolve.llm import invoke_rate_limited
+from revolve.llm_hedge import LatencyHistory, LLMDeadlineExceeded, hedged_call
+from revolve.llm_rate_limit import LLMRateLimiter
+from revolve.llm_usage import get_usage_tracker
+
+
+class HedgedCallTestCase(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(llm_hedge, "_history", LatencyHistory())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        get_usage_tracker().reset()
+        self.addCleanup(get_usage_tracker().reset)
+
+    def test_percentile_needs_enough_samples(self):
+        history = LatencyHistory()
+        for seconds in range(1, 11):
+            history.add("process_table", seconds)
+        self.assertEqual(9, history.percentile("process_table", 90, min_samples=10))
+        self.assertIsNone(history.percentile("process_table", 90, min_samples=11))
+
+    def test_slow_call_is_hedged_and_the_loser_cancelled(self):
+        for _ in range(5):
+            llm_hedge._history.add("process_table", 0.05)
+        cancelled = threading.Event()
+
+        def call(cancel, hedge):
+            cancel.sent()
+            if hedge:
+                return "hedge"
+            cancel.wait(5)
+            cancelled.set()
+            return "primary"
+
+        env = {"LLM_HEDGE_PERCENTILE": "95", "LLM_HEDGE_MIN_SAMPLES": "5"}
+        with mock.patch.dict(os.environ, env):
+            self.assertEqual("hedge", hedged_call("process_table", call))
+
+        self.assertTrue(cancelled.wait(1))
+        events = get_usage_tracker().summary()["by_node"]["process_table"]
+        self.assertEqual((1, 1), (events["hedges"], events["hedge_wins"]))
+
+    def test_deadline(self):
+        def call(cancel, hedge):
+            cancel.sent()
+            cancel.wait(5)
+
+        started = time.monotonic()
+        with mock.patch.dict(os.environ, {"LLM_CALL_DEADLINE_SECONDS": "0.1"}):
+            with self.assertRaises(LLMDeadlineExceeded):
+                hedged_call("generate_api", call)
+        self.assertLess(time.monotonic() - started, 1)
+
+    def test_deadline_starts_once_the_request_is_sent(self):
+        def call(cancel, hedge):
+            time.sleep(0.3)  # queued behind the rate limits
+            cancel.sent()
+            time.sleep(0.05)
+            return "done"
+
+        with mock.patch.dict(os.environ, {"LLM_CALL_DEADLINE_SECONDS": "0.2"}):
+            self.assertEqual("done", hedged_call("generate_api", call))
+
+    def test_abandoned_request_keeps_its_slot_until_it_returns(self):
+        limiter = LLMRateLimiter(max_concurrency=1)
+        release = threading.Event()
+        self.addCleanup(release.set)
+        runnable = mock.Mock()
+        runnable.invoke.side_effect = lambda messages: release.wait(5)
+
+        def call(cancel, hedge):
+            return invoke_rate_limited(runnable, [], cancel=cancel)
+
+        with mock.patch("revolve.llm.get_rate_limiter", return_value=limiter):
+            with mock.patch.dict(os.environ, {"LLM_CALL_DEADLINE_SECONDS": "0.1"}):
+                with self.assertRaises(LLMDeadlineExceeded):
+                    hedged_call("generate_api", call)
+
+        # The abandoned request is still in flight, so it still counts against the concurrency limit.
+        self.assertFalse(limiter._semaphore.acquire(timeout=0.2))
+        release.set()
+        self.assertTrue(limiter._semaphore.acquire(timeout=1))
+        limiter._semaphore.release()
+
+if __name__ == "__main__":
+    unittest.main()
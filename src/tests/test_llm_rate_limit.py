@@ -0,0 +1,33 @@
+import unittest
+from unittest import mock
+
+from revolve.llm_rate_limit import TokenBucket, retry_after
+
+
+class TokenBucketTestCase(unittest.TestCase):
+    def test_reservations_beyond_capacity_wait_in_order(self):
+        with mock.patch("revolve.llm_rate_limit.time.monotonic", return_value=100.0):
+            bucket = TokenBucket(per_minute=60)  # one token per second
+            self.assertEqual(0.0, bucket.reserve(60))
+            self.assertEqual(1.0, bucket.reserve(1))
+            self.assertEqual(3.0, bucket.reserve(2))
+
+    def test_refills_over_time(self):
+        with mock.patch("revolve.llm_rate_limit.time.monotonic", side_effect=[100.0, 100.0, 130.0]):
+            bucket = TokenBucket(per_minute=60)
+            bucket.reserve(60)
+            self.assertEqual(0.0, bucket.reserve(30))
+
+
+class RetryAfterTestCase(unittest.TestCase):
+    def test_reads_retry_after_headers(self):
+        error = mock.Mock(response=mock.Mock(headers={"retry-after-ms": "1500"}))
+        self.assertEqual(1.5, retry_after(error))
+        error = mock.Mock(response=mock.Mock(headers={"retry-after": "7"}))
+        self.assertEqual(7.0, retry_after(error))
+        error = mock.Mock(response=mock.Mock(headers={"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"}))
+        self.assertIsNone(retry_after(error))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from revolve.llm_usage import LLMUsageTracker, call_cost, format_summary
+
+
+class LLMUsageTrackerTestCase(unittest.TestCase):
+    def test_cost_discounts_cached_prompt_tokens(self):
+        self.assertEqual(0.0085, call_cost("gpt-4.1", prompt_tokens=3000, completion_tokens=500, cached_tokens=1000))
+        self.assertIsNone(call_cost("local-model", 100, 100))
+        with mock.patch.dict(os.environ, {"LLM_PRICING": json.dumps({"local-model": [1, 1, 1]})}):
+            self.assertEqual(0.0002, call_cost("local-model", 100, 100))
+
+    def test_summary_groups_calls_by_node_and_table(self):
+        tracker = LLMUsageTracker()
+        tracker.record("process_table", "orders", model="gpt-4.1", wall_seconds=12.5, queue_seconds=0.5,
+                       prompt_tokens=3000, completion_tokens=500, cached_tokens=1000)
+        tracker.record("test_node", "orders", model="gpt-4.1", wall_seconds=3, retries=1, prompt_tokens=1000,
+                       completion_tokens=100, error="ValidationError: bad")
+        tracker.record("process_table", "customers", model="gpt-4.1", source="cache")
+
+        summary = tracker.summary()
+
+        self.assertEqual(3, summary["totals"]["calls"])
+        self.assertEqual(1, summary["totals"]["errors"])
+        self.assertEqual(0.0113, summary["totals"]["cost"])
+        self.assertEqual(2, summary["by_node"]["process_table"]["calls"])
+        self.assertEqual(0.333, summary["by_node"]["process_table"]["cached_prompt_share"])
+        self.assertEqual(15.5, summary["by_table"]["orders"]["wall_seconds"])
+        self.assertEqual(1, summary["by_table"]["orders"]["retries"])
+        self.assertIn("slowest node process_table", format_summary(summary))
+
+        with tempfile.TemporaryDirectory() as folder:
+            with open(tracker.write_summary(folder)) as f:
+                self.assertEqual(3, len(json.load(f)["calls"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+import unittest
+
+from revolve.db.mongodb_adapter import _find_write_stage
+
+
+class FindWriteStageTestCase(unittest.TestCase):
+    def test_read_only_pipeline(self):
+        pipeline = [
+            {"$match": {"status": "open", "note": "$out of stock"}},
+            {"$lookup": {"from": "customers", "pipeline": [{"$match": {"active": True}}], "as": "customer"}},
+            {"$group": {"_id": "$customer_id", "total": {"$sum": "$amount"}}},
+        ]
+        self.assertIsNone(_find_write_stage(pipeline))
+        self.assertIsNone(_find_write_stage({"status": {"$in": ["open", "closed"]}}))
+
+    def test_top_level_write_stage(self):
+        self.assertEqual("$out", _find_write_stage([{"$match": {}}, {"$out": "orders_copy"}]))
+        self.assertEqual("$merge", _find_write_stage([{"$merge": {"into": "orders_copy"}}]))
+
+    def test_write_stage_in_facet(self):
+        pipeline = [{"$facet": {"counts": [{"$count": "n"}], "copy": [{"$merge": {"into": "orders_copy"}}]}}]
+        self.assertEqual("$merge", _find_write_stage(pipeline))
+
+    def test_write_stage_in_lookup_pipeline(self):
+        pipeline = [{"$lookup": {"from": "customers", "pipeline": [{"$out": "stolen"}], "as": "customer"}}]
+        self.assertEqual("$out", _find_write_stage(pipeline))
+
+    def test_write_stage_in_union_with(self):
+        pipeline = [{"$unionWith": {"coll": "archive", "pipeline": [{"$match": {}}, {"$out": "archive_copy"}]}}]
+        self.assertEqual("$out", _find_write_stage(pipeline))
+
+
+if __name__ == "__main__":
+    unittest.main()
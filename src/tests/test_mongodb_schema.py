@@ -0,0 +1,30 @@
+import datetime
+import unittest
+
+from bson import ObjectId
+
+from revolve.db.mongodb_schema import infer_schema
+
+
+class InferSchemaTestCase(unittest.TestCase):
+    def test_merges_types_frequency_and_nullability(self):
+        schema = infer_schema([
+            {"_id": ObjectId(), "name": "a", "tags": ["x", 1], "address": {"city": "Oslo"}},
+            {"_id": ObjectId(), "name": None, "created": datetime.datetime(2024, 1, 1), "address": {"city": "Rome", "zip": 10}},
+            {"_id": ObjectId(), "name": "c", "tags": [], "address": {"city": "Lima"}},
+            {"_id": ObjectId(), "name": "d", "address": None},
+        ])
+        properties = schema["properties"]
+
+        self.assertEqual(4, schema["sample_size"])
+        self.assertEqual(["_id"], schema["required"])
+        self.assertEqual({"bsonType": "string", "frequency": 1.0, "nullable": True}, properties["name"])
+        self.assertEqual({"bsonType": "date", "frequency": 0.25}, properties["created"])
+        self.assertEqual(["string", "int"], properties["tags"]["items"]["bsonType"])
+        self.assertTrue(properties["address"]["nullable"])
+        self.assertEqual(["city"], properties["address"]["required"])
+        self.assertEqual(0.333, properties["address"]["properties"]["zip"]["frequency"])
+
+
+if __name__ == "__main__":
+    unittest.main()
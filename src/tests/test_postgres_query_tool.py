@@ -0,0 +1,92 @@
+import json
+import os
+import unittest
+from contextlib import contextmanager
+from unittest import mock
+
+from revolve.db.postgres_adapter import _DECLARABLE_QUERY, PostgresAdapter, _single_statement
+
+
+class FakeCursor:
+    def __init__(self, rows, executed):
+        self.rows = rows
+        self.executed = executed
+        self.description = [("id",), ("name",)]
+        self.itersize = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        self.executed.append(query)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+class FakeConnection:
+    closed = False
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.executed = []
+        self.sessions = []
+
+    def cursor(self, name=None):
+        return FakeCursor(self.rows, self.executed)
+
+    def set_session(self, readonly=None):
+        self.sessions.append(readonly)
+
+    def rollback(self):
+        pass
+
+
+class ReadOnlyQueryToolTestCase(unittest.TestCase):
+    def run_query(self, query, rows, **env):
+        conn = FakeConnection(rows)
+        adapter = PostgresAdapter.__new__(PostgresAdapter)
+
+        @contextmanager
+        def connection():
+            yield conn
+
+        adapter._connection = connection
+        with mock.patch.dict(os.environ, env):
+            return conn, adapter.run_read_only_query(query)
+
+    def test_declarable_queries(self):
+        for query in ("SELECT 1", "  with t as (select 1) select * from t", "(SELECT 1) UNION (SELECT 2)",
+                      "VALUES (1)", "TABLE users"):
+            self.assertTrue(_DECLARABLE_QUERY.match(query), query)
+        for query in ("SHOW search_path", "EXPLAIN SELECT 1", "SET TRANSACTION READ WRITE", "selected"):
+            self.assertFalse(_DECLARABLE_QUERY.match(query), query)
+
+    def test_multiple_statements_are_rejected(self):
+        self.assertEqual("SELECT 1", _single_statement("SELECT 1; -- trailing comment"))
+        for query in ("SELECT 1; COMMIT; DELETE FROM users", "SET TRANSACTION READ WRITE; DELETE FROM users; COMMIT"):
+            conn, result = self.run_query(query, [(1, "a")])
+            self.assertTrue(result.startswith("Error running query"), result)
+            self.assertEqual([], conn.executed)
+
+    def test_row_and_byte_caps(self):
+        rows = [(i, "x" * 10) for i in range(10)]
+
+        conn, result = self.run_query("SELECT id, name FROM users", rows, QUERY_TOOL_MAX_ROWS="3")
+        result = json.loads(result)
+        self.assertEqual((3, 4, True, "max_rows"),
+                         (result["row_count"], result["rows_read"], result["truncated"], result["truncated_reason"]))
+        self.assertEqual([True, "default"], conn.sessions)
+
+        result = json.loads(self.run_query("SELECT id, name FROM users", rows, QUERY_TOOL_MAX_BYTES="40")[1])
+        self.assertEqual((2, "max_bytes"), (result["row_count"], result["truncated_reason"]))
+
+        result = json.loads(self.run_query("SELECT id, name FROM users", rows[:2])[1])
+        self.assertEqual((2, False, None), (result["row_count"], result["truncated"], result["truncated_reason"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
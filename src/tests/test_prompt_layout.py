@@ -0,0 +1,48 @@
+import os
+import unittest
+from unittest import mock
+
+from revolve.prompts import get_process_table_prompt, get_test_generation_prompt, get_test_revising_prompt
+
+
+def shared_prefix(first: list, second: list) -> str:
+    a, b = first[0]["content"] + first[1]["content"], second[0]["content"] + second[1]["content"]
+    length = next((i for i, (x, y) in enumerate(zip(a, b)) if x != y), min(len(a), len(b)))
+    return a[:length]
+
+
+class PromptLayoutTestCase(unittest.TestCase):
+    """Per-table prompts must share everything run-wide as one prefix so provider prompt caching can reuse it."""
+
+    def test_static_context_precedes_per_table_content(self):
+        shared = {"test_example": "EXAMPLE_TEST", "api_code": "API_CODE", "utils": "DB_UTILS"}
+        prompts = [
+            get_test_generation_prompt(table_name=table, schema=f"{table}_schema", resouce_file=f"{table}.py",
+                                       resource_file_name=f"{table}.py", **shared)
+            for table in ("orders", "customers")
+        ]
+        prefix = shared_prefix(*prompts)
+        for blob in shared.values():
+            self.assertIn(blob, prefix)
+
+        prompts = [
+            get_test_revising_prompt(individual_prompt=f"CRUD for {table}", source_code=f"{table}.py",
+                                     example_resource_code="EXAMPLE_RESOURCE", test_code=f"test_{table}.py",
+                                     api_code="API_CODE", table_name=table, schema=f"{table}_schema",
+                                     utils="DB_UTILS", pytest_response="1 failed", resource_file_name=f"{table}.py")
+            for table in ("orders", "customers")
+        ]
+        prefix = shared_prefix(*prompts)
+        for blob in ("EXAMPLE_RESOURCE", "API_CODE", "DB_UTILS"):
+            self.assertIn(blob, prefix)
+
+        with mock.patch.dict(os.environ, {"DB_TYPE": "postgres"}):
+            prompts = [
+                get_process_table_prompt("DB_UTILS", "SERVICE_TEMPLATE", table, f"{table}_schema", f"CRUD for {table}")
+                for table in ("orders", "customers")
+            ]
+        self.assertEqual(prompts[0][0], prompts[1][0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import os
+import tempfile
+import unittest
+import uuid
+from unittest import mock
+
+from revolve.db.schema_cache import SchemaCache
+
+
+class SchemaCacheTestCase(unittest.TestCase):
+    def test_reuses_entry_until_fingerprint_changes(self):
+        cache = SchemaCache()
+        load = mock.Mock(side_effect=[{"users": []}, {"users": [], "orders": []}])
+        key = ("postgres", "localhost", "5432", "shop", "revolve")
+
+        self.assertEqual({"users": []}, cache.get(key, [10, 100], load))
+        self.assertEqual({"users": []}, cache.get(key, [10, 100], load))
+        self.assertEqual({"users": [], "orders": []}, cache.get(key, [11, 101], load))
+
+        self.assertEqual(2, load.call_count)
+        self.assertEqual({"hits": 1, "misses": 2, "entries": 1}, cache.stats())
+
+    def test_persisted_entries_survive_a_new_cache(self):
+        key = ("mongodb", "localhost", "27017", "shop", None)
+        with tempfile.TemporaryDirectory() as cache_dir, mock.patch.dict("os.environ", {"SCHEMA_CACHE_DIR": cache_dir}):
+            SchemaCache().get(key, "abc", lambda: {"users": {"bsonType": "object"}})
+
+            load = mock.Mock()
+            self.assertEqual({"users": {"bsonType": "object"}}, SchemaCache().get(key, "abc", load))
+            load.assert_not_called()
+
+
+@unittest.skipUnless(os.getenv("DB_NAME") and os.getenv("DB_HOST"), "needs a Postgres database configured through DB_*")
+class PostgresSchemaFingerprintTestCase(unittest.TestCase):
+    def setUp(self):
+        from revolve.db.postgres_adapter import PostgresAdapter
+
+        self.adapter = PostgresAdapter()
+        suffix = uuid.uuid4().hex[:8]
+        self.parent, self.child = f"fingerprint_parent_{suffix}", f"fingerprint_child_{suffix}"
+        self.execute(f"CREATE TABLE {self.parent} (id int PRIMARY KEY)")
+        self.addCleanup(self.execute, f"DROP TABLE IF EXISTS {self.child}, {self.parent}")
+        self.execute(
+            f"CREATE TABLE {self.child} (id int PRIMARY KEY, "
+            f"parent_id int CONSTRAINT {self.child}_fk REFERENCES {self.parent} (id))"
+        )
+
+    def execute(self, statement):
+        with self.adapter._connection() as conn, conn.cursor() as cur:
+            cur.execute(statement)
+            conn.commit()
+
+    def test_dropping_a_foreign_key_changes_the_fingerprint(self):
+        before = self.adapter.get_schema_fingerprint()
+        self.assertEqual(before, self.adapter.get_schema_fingerprint())
+
+        self.execute(f"ALTER TABLE {self.child} DROP CONSTRAINT {self.child}_fk")
+
+        self.assertNotEqual(before, self.adapter.get_schema_fingerprint())
+
+
+if __name__ == '__main__':
+    unittest.main()
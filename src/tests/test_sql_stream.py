@@ -0,0 +1,50 @@
+import io
+import unittest
+
+from revolve.db.sql_stream import SqlStatementReader
+
+DUMP = b"""\\restrict abc
+-- Name: users; Type: TABLE
+SET client_encoding = 'UTF8';
+CREATE TABLE public.users (id integer, note text DEFAULT 'a;b''c');
+CREATE FUNCTION public.touch() RETURNS trigger AS $body$
+BEGIN
+    NEW.note := E'x\\';y'; /* nested /* comment; */ still */
+    RETURN NEW;
+END;
+$body$ LANGUAGE plpgsql;
+-- Data for Name: users
+COPY public.users (id, note) FROM stdin;
+1\tsemi;colon
+2\t\\N
+\\.
+SELECT date'2024-01-01';
+"""
+
+
+class SqlStatementReaderTestCase(unittest.TestCase):
+    def test_splits_statements_and_streams_copy_blocks(self):
+        reader = SqlStatementReader(io.BytesIO(DUMP))
+        statements = []
+        copy_rows = None
+        for statement in reader:
+            statements.append(statement.text)
+            if statement.copy_data is not None:
+                copy_rows = statement.copy_data.read()
+
+        self.assertEqual(5, len(statements))
+        self.assertEqual("SET client_encoding = 'UTF8';", statements[0])
+        self.assertTrue(statements[1].endswith("DEFAULT 'a;b''c');"))
+        self.assertTrue(statements[2].startswith("CREATE FUNCTION") and statements[2].endswith("plpgsql;"))
+        self.assertEqual("COPY public.users (id, note) FROM stdin;", statements[3])
+        self.assertEqual(b"1\tsemi;colon\n2\t\\N\n", copy_rows)
+        self.assertEqual("SELECT date'2024-01-01';", statements[4])
+        self.assertEqual(len(DUMP), reader.bytes_read)
+
+    def test_unread_copy_data_is_skipped(self):
+        statements = [statement.text for statement in SqlStatementReader(io.BytesIO(DUMP))]
+        self.assertEqual("SELECT date'2024-01-01';", statements[-1])
+
+
+if __name__ == "__main__":
+    unittest.main()